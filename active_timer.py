@@ -0,0 +1,50 @@
+# active_timer.py
+from datetime import datetime, timedelta
+
+
+def decode_break_duration(encoded_value):
+    """Decode the legacy packed break_duration into (break, original work) minutes"""
+    if encoded_value is None:
+        return 5, 25
+
+    break_dur = encoded_value // 1000
+    work_dur = encoded_value % 1000
+
+    # Sanity checks
+    if break_dur <= 0 or break_dur > 60:
+        break_dur = 5
+    if work_dur <= 0 or work_dur > 120:
+        work_dur = 25
+
+    return break_dur, work_dur
+
+
+def timer_durations(row):
+    """(break_minutes, work_minutes) of a row; rows from before the column split are unpacked"""
+    if row.get("work_minutes") is not None and row.get("break_minutes") is not None:
+        return row["break_minutes"], row["work_minutes"]
+    return decode_break_duration(row.get("break_duration"))
+
+
+def parse_start_time(row):
+    """Timezone-aware start time of an active_timer row"""
+    return datetime.fromisoformat(row["start_time"].replace("Z", "+00:00"))
+
+
+def phase_deadline(row):
+    """When the row's current phase runs out"""
+    return parse_start_time(row) + timedelta(minutes=row["duration_minutes"])
+
+
+def load_active_timer(write_queue, storage, user_id):
+    """The user's active_timer row as it will be once queued writes land"""
+    pending = write_queue.pending_active_timer(user_id)
+    if pending and pending["kind"] == "delete":
+        return None
+    if pending and pending["kind"] == "upsert":
+        return pending["data"]
+
+    data = storage.get_active_timer(user_id)
+    if data and pending:
+        data.update(pending["data"])
+    return data
@@ -1,35 +1,57 @@
-import time
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, timezone
-from supabase_client import supabase
-@st.cache_data(ttl=60)
+from session_cache import get_session_cache, get_user_rollup, get_user_streaks, resync_user_sessions
+from daily_rollup import empty_rollup
+from analytics_engine import summarize, PreparedSessions
+from settings import get_setting
+from page_data import take_prefetched, discard_prefetched
+from figure_cache import cached_figure
 # ---------------------- Data Fetch ----------------------
-def fetch_sessions():
+def fetch_sessions(user_id):
+    """(frame, version): the user's preprocessed sessions, shared between runs so treat it as read-only"""
     try:
-        user_id = st.session_state.user.id
-        response = supabase.table("sessions").select("*").eq("user_id", user_id).execute()
-        return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+        frame, version = take_prefetched("sessions", get_session_cache().get_versioned, user_id)
+        return get_prepared_sessions().get(user_id, frame, version), version
     except Exception as e:
         st.error(f"❌ Failed to fetch data: {e}")
-        return pd.DataFrame()
-
-@st.cache_data(ttl=60)
-def preprocess(df):
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df["date"] = df["timestamp"].dt.date
-    df["total"] = df["work_minutes"] + df["break_minutes"]
-    df["efficiency"] = df["work_minutes"] / df["total"] * 100
-    return df
+        return pd.DataFrame(), None
+
+def fetch_daily_rollup(user_id):
+    try:
+        return get_user_rollup(user_id)
+    except Exception as e:
+        st.error(f"❌ Failed to fetch daily totals: {e}")
+        return empty_rollup(), None
+
+@st.cache_resource
+def get_prepared_sessions():
+    """Process-wide preprocessed frames, one per user"""
+    return PreparedSessions()
+
+def render_insights(lines, delay=0.6):
+    """Emit an insight panel in one block; the browser staggers the fade-in"""
+    if get_setting("animations_enabled"):
+        wrapper_class = "insight-wrapper"
+        items = [
+            f"<div class='insight-line' style='animation-delay: {i * delay:.1f}s'>{line}</div>"
+            for i, line in enumerate(lines)
+        ]
+    else:
+        wrapper_class = "insight-wrapper insight-static"
+        items = [f"<div class='insight-line'>{line}</div>" for line in lines]
+    st.markdown(f"<div class='{wrapper_class}'>{''.join(items)}</div>", unsafe_allow_html=True)
+
 # ---------------------- Dashboard ----------------------
-def show_dashboard():
+def show_dashboard(user):
      # ----------- INTRO ANIMATION -----------
     if "intro_shown" not in st.session_state:
         st.session_state.intro_shown = False
 
-    if not st.session_state.intro_shown:
+    # Plays entirely in the browser; the dashboard keeps rendering underneath it
+    if not st.session_state.intro_shown and get_setting("show_intro"):
         st.markdown("""
         <style>
         .intro-overlay {
@@ -44,14 +66,14 @@ def show_dashboard():
             justify-content: center;
             align-items: center;
             z-index: 9999;
+            animation: fadeOutOverlay 1s ease 5.7s forwards;
         }
 
         .intro-overlay img {
             width: 130px;
             height: 130px;
             margin-bottom: 20px;
-            animation: dropBounce 1s ease-out forwards;
-            animation-delay: 0.1s;
+            animation: dropBounce 1s ease-out 0.1s forwards, fadeOutImage 1s ease 5.2s forwards;
         }
 
         .intro-overlay h1 {
@@ -83,7 +105,7 @@ def show_dashboard():
         }
 
         @keyframes fadeOutOverlay {
-            to { opacity: 0; visibility: hidden; }
+            to { opacity: 0; visibility: hidden; pointer-events: none; }
         }
         </style>
 
@@ -91,27 +113,9 @@ def show_dashboard():
             <img id="intro-img" src="https://i.gifer.com/Z30J.gif" alt="Loading..." />
             <h1 id="intro-text">Welcome to PomodoroDash</h1>
         </div>
-
-        <script>
-        setTimeout(() => {
-            const img = document.getElementById('intro-img');
-            if (img) {
-                img.style.animation = 'fadeOutImage 1s ease forwards';
-            }
-        }, 5200); // Image fades out after text disappears
-
-        setTimeout(() => {
-            const intro = document.getElementById('intro');
-            if (intro) {
-                intro.style.animation = 'fadeOutOverlay 1s ease forwards';
-            }
-        }, 5700); // Overlay fades after image
-        </script>
         """, unsafe_allow_html=True)
 
-        time.sleep(6)
-        st.session_state.intro_shown = True
-        st.rerun()
+    st.session_state.intro_shown = True
 
 
     # ----------- DASHBOARD STYLES -----------
@@ -189,6 +193,11 @@ def show_dashboard():
             padding: 6px 0;
         }
 
+        .insight-static .insight-line {
+            opacity: 1;
+            animation: none;
+        }
+
         @keyframes fadeIn {
             from { opacity: 0; transform: translateY(5px); }
             to { opacity: 1; transform: translateY(0); }
@@ -199,25 +208,63 @@ def show_dashboard():
     # ----------- DASHBOARD CONTENT -----------
     st.markdown("<h2 style='color:#00f2ff; font-weight:600;'>📊 Productivity Dashboard</h2>", unsafe_allow_html=True)
 
-    df_raw = fetch_sessions()
-    if df_raw.empty:
+    user_id = user.id
+    if st.button("🔄 Resync data", help="Reload your full session history from the database"):
+        resync_user_sessions(user_id)
+        discard_prefetched("sessions")
+
+    df, version = fetch_sessions(user_id)
+    if df.empty:
         st.info("No session data found.")
         return
-    df = preprocess(df_raw)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df["date"] = df["timestamp"].dt.date
-    df["total"] = df["work_minutes"] + df["break_minutes"]
-    df["efficiency"] = df["work_minutes"] / df["total"] * 100
 
-    total_sessions = len(df)
-    total_minutes = df["total"].sum()
-    avg_efficiency = round(df["efficiency"].mean(), 1)
+    dashboard_sections(user_id, df, version)
+
+    # ------- Footer -------
+    st.markdown("""
+    <hr style="margin-top: 3rem; margin-bottom: 1rem; border: none; border-top: 1px solid #444;">
+    <div style='text-align: center; font-size: 14px; color: #888; padding-bottom: 15px;'>
+         Created by <strong>Bilal Ahmad</strong>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+DASHBOARD_SECTIONS = {
+    "🎯 Overview": "overview",
+    "📅 Trends": "trends",
+    "📊 Explore": "explore",
+    "🧠 Summary": "summary",
+}
+
+
+@st.fragment
+def dashboard_sections(user_id, df, version):
+    """Render only the selected section; switching sections or charts reruns just this fragment"""
+    choice = st.radio(
+        "Dashboard section",
+        list(DASHBOARD_SECTIONS),
+        horizontal=True,
+        key="dashboard_section",
+        label_visibility="collapsed",
+    )
+    section = DASHBOARD_SECTIONS[choice]
+    if section == "overview":
+        overview_section(user_id, df, version)
+    elif section == "trends":
+        trends_section(user_id)
+    elif section == "explore":
+        explore_section(user_id, df)
+    else:
+        summary_section(user_id, df)
+
 
+def overview_section(user_id, df, version):
+    summary = summarize(df, get_user_streaks(user_id))
     st.markdown(f"""
         <div class='kpi-block'>
-            <div class='kpi'><h1>{total_sessions}</h1><p>Total Pomodoro Sessions</p></div>
-            <div class='kpi'><h1>{total_minutes} min</h1><p>Focus Time Logged</p></div>
-            <div class='kpi'><h1>{avg_efficiency}%</h1><p>Average Efficiency</p></div>
+            <div class='kpi'><h1>{summary.total_sessions}</h1><p>Total Pomodoro Sessions</p></div>
+            <div class='kpi'><h1>{summary.total_minutes} min</h1><p>Focus Time Logged</p></div>
+            <div class='kpi'><h1>{summary.avg_efficiency}%</h1><p>Average Efficiency</p></div>
         </div>
     """, unsafe_allow_html=True)
 
@@ -225,56 +272,44 @@ def show_dashboard():
     st.markdown("### 🎯 Session Completion")
     chart_col, insight_col = st.columns([1, 1])
     with chart_col:
-        st.plotly_chart(session_completion_chart(df), use_container_width=True)
+        st.plotly_chart(cached_figure(user_id, version, "session_completion", session_completion_chart, df), use_container_width=True)
     with insight_col:
-        completed_count = (df["status"] == "Completed").sum()
-        early_stop_count = (df["status"] == "Early Stop").sum()
-        completed_time = df[df["status"] == "Completed"]["total"].sum()
-        early_stop_time = df[df["status"] == "Early Stop"]["total"].sum()
-        st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
         insights = [
-            f"✅ <strong>Completed Sessions:</strong> {completed_count}",
-            f"❌ <strong>Early Stops:</strong> {early_stop_count}",
-            f"⏱️ <strong>Completed Time:</strong> {completed_time} minutes",
-            f"🛑 <strong>Early Stop Time:</strong> {early_stop_time} minutes",
+            f"✅ <strong>Completed Sessions:</strong> {summary.completed_count}",
+            f"❌ <strong>Early Stops:</strong> {summary.early_stop_count}",
+            f"⏱️ <strong>Completed Time:</strong> {summary.completed_time} minutes",
+            f"🛑 <strong>Early Stop Time:</strong> {summary.early_stop_time} minutes",
             f"💡 <em>Tracking early stops can reveal patterns of distraction or fatigue.</em>"
         ]
-        for line in insights:
-            st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-            time.sleep(0.6)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_insights(insights, delay=0.6)
 
     st.markdown("### 🕓 Time Allocation")
     chart_col2, insight_col2 = st.columns([1, 1])
     with chart_col2:
-        st.plotly_chart(work_break_chart(df), use_container_width=True)
+        st.plotly_chart(cached_figure(user_id, version, "work_break", work_break_chart, df), use_container_width=True)
     with insight_col2:
-        total_work = df["work_minutes"].sum()
-        total_break = df["break_minutes"].sum()
-        work_percent = round((total_work / (total_work + total_break)) * 100, 1) if total_work + total_break > 0 else 0
-        break_percent = round(100 - work_percent, 1)
-
-        st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
         insights = [
-            f"🔵 <strong>Total Work Time:</strong> {total_work} minutes",
-            f"🟠 <strong>Total Break Time:</strong> {total_break} minutes",
-            f"📊 <strong>Work vs Break Ratio:</strong> {work_percent}% / {break_percent}%",
+            f"🔵 <strong>Total Work Time:</strong> {summary.total_work} minutes",
+            f"🟠 <strong>Total Break Time:</strong> {summary.total_break} minutes",
+            f"📊 <strong>Work vs Break Ratio:</strong> {summary.work_percent}% / {summary.break_percent}%",
             f"💡 <em>Maintaining balance between work and rest boosts long-term productivity.</em>"
         ]
-        for line in insights:
-            st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-            time.sleep(0.6)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_insights(insights, delay=0.6)
+
 
+def trends_section(user_id):
+    rollup, version = fetch_daily_rollup(user_id)
     st.markdown("### 📅 Daily Focus Breakdown")
-    st.plotly_chart(daily_stack_chart(df), use_container_width=True)
+    st.plotly_chart(cached_figure(user_id, version, "daily_stack", daily_stack_chart, rollup), use_container_width=True)
 
     st.markdown("### ⚡ Efficiency Over Time")
-    st.plotly_chart(efficiency_line_chart(df), use_container_width=True)
+    st.plotly_chart(cached_figure(user_id, version, "efficiency_line", efficiency_line_chart, rollup), use_container_width=True)
 
     st.markdown("### 📈 Cumulative Focus Progress")
-    st.plotly_chart(cumulative_focus_chart(df), use_container_width=True)
+    st.plotly_chart(cached_figure(user_id, version, "cumulative_focus", cumulative_focus_chart, rollup), use_container_width=True)
 
+
+def explore_section(user_id, df):
     st.markdown("### 📊 Explore Pomodoro Insights")
     chart_option = st.selectbox(
         "📊 Choose a chart to view:",
@@ -292,8 +327,7 @@ def show_dashboard():
     fig = None
 
     if chart_option == "Weekly Work Duration Trends":
-        df['week'] = pd.to_datetime(df['timestamp']).dt.isocalendar().week
-        weekly = df.groupby('week')['work_minutes'].sum().reset_index()
+        weekly = df['work_minutes'].groupby(df['timestamp'].dt.isocalendar().week).sum().reset_index()
 
         fig = px.line(
             weekly,
@@ -311,7 +345,6 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True, key="weekly_work_chart")
 
         with insight_col:
-            st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
             insights = [
                 "📅 What it shows:",
                 "This chart displays the total number of focused work minutes you logged each week.",
@@ -324,14 +357,10 @@ def show_dashboard():
                 "- Useful for weekly reflections or adjusting future work plans.",
                 "- Spot trends in workload spikes or burnout patterns."
             ]
-            for line in insights:
-                st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-                time.sleep(0.4)
-            st.markdown("</div>", unsafe_allow_html=True)
+            render_insights(insights, delay=0.4)
 
     elif chart_option == "Session Timing Patterns":
-        df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-        hourly_counts = df.groupby('hour').size().reset_index(name='session_count')
+        hourly_counts = df.groupby(df['timestamp'].dt.hour.rename('hour')).size().reset_index(name='session_count')
 
         fig = px.bar(
             hourly_counts,
@@ -353,8 +382,7 @@ def show_dashboard():
         with chart_col:
             st.plotly_chart(fig, use_container_width=True, key="timing_pattern_chart")
         with insight_col:
-            st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
-            for line in [
+            insights = [
                 "⏰ What it shows:",
                 "This chart displays the number of Pomodoro sessions started at each hour of the day.",
                 "",
@@ -365,16 +393,14 @@ def show_dashboard():
                 "- Reveals your peak focus hours during the day.",
                 "- Helps in aligning task scheduling with your natural productivity cycle.",
                 "- Useful to spot irregularities or gaps in your daily focus habits."
-            ]:
-                st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-                time.sleep(0.4)
-            st.markdown("</div>", unsafe_allow_html=True)
+            ]
+            render_insights(insights, delay=0.4)
         custom_rendered = True
 
 
     elif chart_option == "Streak Tracking":
     # Prepare data: Count completed sessions per date
-        streaks = df[df['status'] == 'Completed'].groupby('date').size().reset_index(name='count')
+        streaks = get_user_streaks(user_id).completed_per_day()
 
         # Create the bar chart
         fig = px.bar(
@@ -399,7 +425,6 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True, key="streak_tracking_chart")
 
         with insight_col:
-            st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
             insights = [
                 "🔥 What it shows:",
                 "Visualizes how many Pomodoro sessions you successfully completed each day.",
@@ -412,10 +437,7 @@ def show_dashboard():
                 "- Motivates you to maintain daily momentum.",
                 "- Great for habit tracking and accountability."
             ]
-            for line in insights:
-                st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-                time.sleep(0.4)
-            st.markdown("</div>", unsafe_allow_html=True)
+            render_insights(insights, delay=0.4)
 
 
     elif chart_option == "Session Duration Scatter Plot":
@@ -444,7 +466,6 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True, key="scatter_duration_chart")
 
         with insight_col:
-            st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
             insights = [
                 "🎯 What it shows:",
                 "A timeline of each Pomodoro session with its duration and status.",
@@ -457,23 +478,20 @@ def show_dashboard():
                 "- Spot clusters or outliers (very short or very long sessions).",
                 "- Understand trends in productivity or burnout over time."
             ]
-            for line in insights:
-                st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-                time.sleep(0.4)
-            st.markdown("</div>", unsafe_allow_html=True)
+            render_insights(insights, delay=0.4)
 
 
     elif chart_option == "Activity Heatmap":
-    # Extract hour and weekday from timestamp
-        df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-        df['weekday'] = pd.to_datetime(df['timestamp']).dt.day_name()
-
-        # Optional: Order weekdays for better heatmap readability
+    # Extract hour and weekday from timestamp (df is shared, so into a separate frame)
         weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        df['weekday'] = pd.Categorical(df['weekday'], categories=weekday_order, ordered=True)
+        activity = pd.DataFrame({
+            'hour': df['timestamp'].dt.hour,
+            # Order weekdays for better heatmap readability
+            'weekday': pd.Categorical(df['timestamp'].dt.day_name(), categories=weekday_order, ordered=True),
+        })
 
         # Aggregate session counts by weekday and hour
-        heatmap_data = df.groupby(['weekday', 'hour']).size().reset_index(name='sessions')
+        heatmap_data = activity.groupby(['weekday', 'hour']).size().reset_index(name='sessions')
 
         # Create the density heatmap
         fig = px.density_heatmap(
@@ -502,7 +520,6 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True, key="activity_heatmap_chart")
 
         with insight_col:
-            st.markdown("<div class='insight-wrapper'>", unsafe_allow_html=True)
             insights = [
                 "🌡️ What it shows:",
                 "This heatmap visualizes how many Pomodoro sessions were started for each hour of each day.",
@@ -515,10 +532,7 @@ def show_dashboard():
                 "- Helps schedule deep work during your personal productivity peaks.",
                 "- Reveals patterns like weekend dips or late-night focus spikes."
             ]
-            for line in insights:
-                st.markdown(f"<div class='insight-line'>{line}</div>", unsafe_allow_html=True)
-                time.sleep(0.4)
-            st.markdown("</div>", unsafe_allow_html=True)
+            render_insights(insights, delay=0.4)
 
 
     elif chart_option == "View Last 10 Sessions":
@@ -558,64 +572,10 @@ def show_dashboard():
         "View Sessions from Last 7 Days"
     ]:
         st.plotly_chart(fig, use_container_width=True)
-    # Calculate Most Active Day
-    df['weekday'] = pd.to_datetime(df['timestamp']).dt.day_name()
-    most_active_day = df['weekday'].value_counts().idxmax()
-
-    # Calculate Peak Productivity Week
-    df['week'] = pd.to_datetime(df['timestamp']).dt.isocalendar().week
-    weekly_work = df.groupby('week')['work_minutes'].sum()
-    peak_week = weekly_work.idxmax()
-    from statistics import mode
-
-# 🕐 Most Common Session Hour
-    df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-    common_hour = df['hour'].mode()[0]
-
-    # 🔁 Longest Streak of Consecutive Days with Sessions
-    dates_with_sessions = sorted(df['date'].unique())
-    longest_streak = current_streak = 1
-    for i in range(1, len(dates_with_sessions)):
-        if (dates_with_sessions[i] - dates_with_sessions[i-1]).days == 1:
-            current_streak += 1
-            longest_streak = max(longest_streak, current_streak)
-        else:
-            current_streak = 1
-
-    # ⏱️ Average Session Duration
-    average_duration = round(df['total'].mean(), 1)
-
-    # 🧠 Best Focus Day (Highest Avg Efficiency)
-    best_focus_day = (
-        df.groupby('weekday')['efficiency'].mean()
-        .sort_values(ascending=False)
-        .idxmax()
-    )
-    # 🎯 Consistency Score = Average number of active days per week
-    df['week'] = pd.to_datetime(df['timestamp']).dt.isocalendar().week
-    df['year'] = pd.to_datetime(df['timestamp']).dt.isocalendar().year
-    week_day_counts = df.groupby(['year', 'week'])['date'].nunique()
-    consistency_score = round(week_day_counts.mean(), 2)
-    # Ensure timestamps are timezone-aware
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-    # Filter last 30 days
-    last_30 = df[df['timestamp'] >= datetime.now(timezone.utc) - timedelta(days=30)].copy()
-
-    # Define time ranges
-    cutoff = datetime.now(timezone.utc) - timedelta(days=15)
-    first_half = last_30[last_30['timestamp'] < cutoff]['work_minutes'].sum()
-    second_half = last_30[last_30['timestamp'] >= cutoff]['work_minutes'].sum()
-
-    # Progress calculation
-    if first_half > 0:
-        progress_percent = round(((second_half - first_half) / first_half) * 100, 1)
-    else:
-        progress_percent = 0  # To avoid division by zero
 
 
-
-    # Add after all dropdown charts are rendered
+def summary_section(user_id, df):
+    summary = summarize(df, get_user_streaks(user_id))
     st.markdown("### 🧠 Final Productivity Summary")
     st.markdown(f"""
     <style>
@@ -642,32 +602,22 @@ def show_dashboard():
 
     <div class='final-summary-box'>
         <ul>
-            <li>✅ <strong>Total Sessions Logged:</strong> {total_sessions}</li>
-            <li>🕓 <strong>Focus Time Accumulated:</strong> {total_minutes} minutes</li>
-            <li>⚡ <strong>Average Efficiency:</strong> {avg_efficiency}%</li>
-            <li>📅 <strong>Most Active Day:</strong> {most_active_day}</li>
-            <li>📈 <strong>Peak Productivity Week:</strong> Week {peak_week}</li>
+            <li>✅ <strong>Total Sessions Logged:</strong> {summary.total_sessions}</li>
+            <li>🕓 <strong>Focus Time Accumulated:</strong> {summary.total_minutes} minutes</li>
+            <li>⚡ <strong>Average Efficiency:</strong> {summary.avg_efficiency}%</li>
+            <li>📅 <strong>Most Active Day:</strong> {summary.most_active_day}</li>
+            <li>📈 <strong>Peak Productivity Week:</strong> Week {summary.peak_week}</li>
             <li>💡 <strong>Tip:</strong> Maintain your streak and aim for consistent daily progress!</li>
-            <li>🎯 <strong>Consistency Score:</strong> {consistency_score} active days/week</li>
-            <li>🚀 <strong>Progress (Last 30 Days):</strong> {progress_percent}% change in work time</li>
-            <li>🧠 <strong>Best Focus Day:</strong> {best_focus_day}</li>
-            <li>⏱️ <strong>Average Session Duration:</strong> {average_duration} minutes</li>
-            <li>🕐 <strong>Most Frequent Start Hour:</strong> {common_hour}:00</li>
-            <li>🔥 <strong>Longest Daily Streak:</strong> {longest_streak} days</li>
+            <li>🎯 <strong>Consistency Score:</strong> {summary.consistency_score} active days/week</li>
+            <li>🚀 <strong>Progress (Last 30 Days):</strong> {summary.progress_percent}% change in work time</li>
+            <li>🧠 <strong>Best Focus Day:</strong> {summary.best_focus_day}</li>
+            <li>⏱️ <strong>Average Session Duration:</strong> {summary.average_duration} minutes</li>
+            <li>🕐 <strong>Most Frequent Start Hour:</strong> {summary.common_hour}:00</li>
+            <li>🔥 <strong>Current Streak:</strong> {summary.current_streak} days</li>
+            <li>🔥 <strong>Longest Daily Streak:</strong> {summary.longest_streak} days</li>
         </ul>
     </div>
     """, unsafe_allow_html=True)
-    # ------- Footer -------
-    st.markdown("""
-    <hr style="margin-top: 3rem; margin-bottom: 1rem; border: none; border-top: 1px solid #444;">
-    <div style='text-align: center; font-size: 14px; color: #888; padding-bottom: 15px;'>
-         Created by <strong>Bilal Ahmad</strong>
-    </div>
-    """, unsafe_allow_html=True)
-
-        
-
-
 
 
 # ---------------------- Charts ----------------------
@@ -693,8 +643,8 @@ def work_break_chart(df):
     fig.update_traces(textinfo="percent+label")
     return fig
 
-def daily_stack_chart(df):
-    grouped = df.groupby("date")[["work_minutes", "break_minutes"]].sum().reset_index()
+def daily_stack_chart(rollup):
+    grouped = rollup[["work_minutes", "break_minutes"]].reset_index()
     fig = go.Figure()
 
     fig.add_trace(go.Bar(
@@ -738,15 +688,13 @@ def daily_stack_chart(df):
 
 
 
-def efficiency_line_chart(df):
-    # Filter for valid sessions (exclude ones where total time is 0)
-    df = df[(df["work_minutes"] > 0) & ((df["work_minutes"] + df["break_minutes"]) > 0)]
-
-    # Truncate timestamp to just date (important for grouping)
-    df["date"] = pd.to_datetime(df["timestamp"]).dt.date
-
-    # Group total work and break time by date (includes all session types)
-    grouped = df.groupby("date")[["work_minutes", "break_minutes"]].sum().reset_index()
+def efficiency_line_chart(rollup):
+    # Only days that had sessions with work time (focus_* columns exclude the rest)
+    grouped = (
+        rollup.loc[rollup["focus_work_minutes"] > 0, ["focus_work_minutes", "focus_break_minutes"]]
+        .rename(columns={"focus_work_minutes": "work_minutes", "focus_break_minutes": "break_minutes"})
+        .reset_index()
+    )
 
     # Compute efficiency as a decimal (0–1)
     grouped["efficiency"] = grouped["work_minutes"] / (grouped["work_minutes"] + grouped["break_minutes"])
@@ -784,12 +732,9 @@ def efficiency_line_chart(df):
 
 
 
-def cumulative_focus_chart(df):
-    # Ensure date column is in datetime format and extract date only
-    df["date"] = pd.to_datetime(df["timestamp"]).dt.date
-
-    # Group by date and calculate cumulative sums
-    cumulative = df.groupby("date")[["work_minutes", "break_minutes"]].sum().cumsum().reset_index()
+def cumulative_focus_chart(rollup):
+    # Running totals over the per-day rollup
+    cumulative = rollup[["work_minutes", "break_minutes"]].cumsum().reset_index()
 
     # Create the cumulative area chart
     fig = go.Figure()
@@ -0,0 +1,114 @@
+# analytics_engine.py
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from streak_index import StreakIndex
+
+
+@dataclass(frozen=True)
+class DashboardSummary:
+    """Every KPI the dashboard shows, computed together from one frame"""
+    total_sessions: int
+    total_minutes: int
+    avg_efficiency: float
+    completed_count: int
+    early_stop_count: int
+    completed_time: int
+    early_stop_time: int
+    total_work: int
+    total_break: int
+    work_percent: float
+    break_percent: float
+    most_active_day: str
+    peak_week: int
+    common_hour: int
+    best_focus_day: str
+    average_duration: float
+    current_streak: int
+    longest_streak: int
+    consistency_score: float
+    progress_percent: float
+
+
+def preprocess(df):
+    """Add the derived columns every chart and KPI reads; returns a new frame and leaves df as is"""
+    total = df["work_minutes"] + df["break_minutes"]
+    return df.assign(
+        date=df["timestamp"].dt.date,
+        total=total,
+        efficiency=df["work_minutes"] / total * 100,
+    )
+
+
+class PreparedSessions:
+    """Preprocessed frame per user, rebuilt only when the session cache reports a new version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}
+
+    def get(self, user_id, frame, version):
+        """Shared, read-only preprocessed frame for this data version"""
+        with self._lock:
+            entry = self._frames.get(user_id)
+        if entry and entry[0] == version:
+            return entry[1]
+        prepared = preprocess(frame)
+        with self._lock:
+            current = self._frames.get(user_id)
+            if current is None or current[0] < version:
+                self._frames[user_id] = (version, prepared)
+        return prepared
+
+
+def summarize(df, streaks=None, now=None):
+    """Build a DashboardSummary from a preprocessed (non-empty) session frame and its StreakIndex"""
+    now = now or datetime.now(timezone.utc)
+    if streaks is None:
+        streaks = StreakIndex.from_frame(df)
+    timestamps = df["timestamp"]
+    iso = timestamps.dt.isocalendar()
+    weekday = timestamps.dt.day_name()
+    hour = timestamps.dt.hour
+    status = df["status"]
+    total = df["total"]
+
+    total_work = int(df["work_minutes"].sum())
+    total_break = int(df["break_minutes"].sum())
+    work_percent = round(total_work / (total_work + total_break) * 100, 1) if total_work + total_break > 0 else 0
+    completed = status == "Completed"
+    early_stop = status == "Early Stop"
+
+    # Busiest hour; ties go to the earliest hour like Series.mode()
+    hour_counts = hour.value_counts().sort_index()
+    weekly_work = df["work_minutes"].groupby(iso["week"]).sum()
+
+    recent = timestamps >= now - timedelta(days=30)
+    second_half = timestamps >= now - timedelta(days=15)
+    first_half_work = df.loc[recent & ~second_half, "work_minutes"].sum()
+    second_half_work = df.loc[second_half, "work_minutes"].sum()
+    progress_percent = round((second_half_work - first_half_work) / first_half_work * 100, 1) if first_half_work > 0 else 0
+
+    return DashboardSummary(
+        total_sessions=len(df),
+        total_minutes=int(total.sum()),
+        avg_efficiency=round(df["efficiency"].mean(), 1),
+        completed_count=int(completed.sum()),
+        early_stop_count=int(early_stop.sum()),
+        completed_time=int(total[completed].sum()),
+        early_stop_time=int(total[early_stop].sum()),
+        total_work=total_work,
+        total_break=total_break,
+        work_percent=work_percent,
+        break_percent=round(100 - work_percent, 1),
+        most_active_day=weekday.value_counts().idxmax(),
+        peak_week=int(weekly_work.idxmax()),
+        common_hour=int(hour_counts.idxmax()),
+        best_focus_day=df["efficiency"].groupby(weekday).mean().idxmax(),
+        average_duration=round(total.mean(), 1),
+        current_streak=streaks.current_streak(now.date()),
+        longest_streak=streaks.longest_streak,
+        consistency_score=streaks.consistency_score(),
+        progress_percent=progress_percent,
+    )
+
@@ -1,20 +1,48 @@
+import logging
 import streamlit as st
-from supabase_client import supabase
 from auth import login_register_page
 from timer import pomodoro_ui
 from analytics import show_dashboard
+from settings import settings_panel, debug_enabled
+from timer_scheduler import get_timer_scheduler
+from write_queue import get_write_queue
+from storage import get_storage
+from session_cache import get_session_cache
+from token_cache import get_token_cache
+from active_timer import load_active_timer
+from timer_state import get_timer_states
+from page_data import begin_prefetch, prefetch
+from auth_context import begin_auth_context
 from url_session_manager import (
-    is_authenticated, 
     get_current_user, 
     clear_session_from_url,
-    load_session_from_url
+    decode_session_data
 )
 
+logger = logging.getLogger(__name__)
+
 def initialize_session():
     """Initialize session state variables"""
     if "session_initialized" not in st.session_state:
         st.session_state.session_initialized = True
 
+def start_page_fetches(auth_context):
+    """First run of a browser session: refresh the URL's token while the page starts rendering"""
+    begin_prefetch()
+    if st.session_state.get("user"):
+        return
+    session_data = decode_session_data(st.query_params.get("session", ""))
+    if session_data and session_data.get("refresh_token"):
+        prefetch("auth", get_token_cache().resolve, session_data["refresh_token"], auth_context)
+
+def start_user_fetches(user_id):
+    """Issue the verified user's independent reads together so the page waits for the slowest, not the sum"""
+    # The database is only read for the timer when this session hasn't synced it yet
+    timer_synced = "timer_state_version" in st.session_state and get_timer_states().get(user_id) is not None
+    if not st.session_state.get("running", False) and not timer_synced:
+        prefetch("active_timer", load_active_timer, get_write_queue(), get_storage(), user_id)
+    prefetch("sessions", get_session_cache().get_versioned, user_id)
+
 def main():
     st.set_page_config(page_title="Pomodash", layout="wide")
 
@@ -61,17 +89,25 @@ def main():
     
     # Initialize session
     initialize_session()
-    
-    # Check authentication - this will automatically load from URL if needed
-    if not is_authenticated():
-        login_register_page()
-        return
 
-    # Get current user
+    # Start the background phase scheduler once per process
+    get_timer_scheduler()
+
+    # Resolve the user once for this run; everything below gets it passed in
+    auth_context = begin_auth_context()
+    start_page_fetches(auth_context)
+
+    # Loads from the URL if needed
     current_user = get_current_user()
+    if auth_context.network_calls:
+        logger.info("Auth API calls while resolving this run's user: %d", auth_context.network_calls)
+    if debug_enabled():
+        st.sidebar.caption(f"🔧 Auth API calls this run: {auth_context.network_calls}")
     if not current_user:
         login_register_page()
         return
+    # Only now: the URL's user_id is unverified until its token has been refreshed
+    start_user_fetches(current_user.id)
 
     # Header with logout
     st.markdown('<div class="responsive-wrapper">', unsafe_allow_html=True)
@@ -88,10 +124,13 @@ def main():
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Before the dashboard, so the first render already follows the user's saved preferences
+    settings_panel(current_user)
+
     # Timer and Dashboard
-    pomodoro_ui()
+    pomodoro_ui(current_user)
     st.markdown("---")
-    show_dashboard()
+    show_dashboard(current_user)
     st.markdown('</div>', unsafe_allow_html=True)
 
 
@@ -1,5 +1,6 @@
 import streamlit as st
-from supabase_client import supabase
+from supabase_client import get_supabase
+from auth_context import current_auth_context
 from datetime import datetime, timezone
 from url_session_manager import save_session_to_url, clear_session_from_url
 
@@ -42,7 +43,8 @@ def handle_login():
         return
 
     try:
-        result = supabase.auth.sign_in_with_password({
+        current_auth_context().count_network_call()
+        result = get_supabase().auth.sign_in_with_password({
             "email": email,
             "password": password
         })
@@ -113,7 +115,8 @@ def register():
                 return
             
             try:
-                result = supabase.auth.sign_up({
+                current_auth_context().count_network_call()
+                result = get_supabase().auth.sign_up({
                     "email": email,
                     "password": password
                 })
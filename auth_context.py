@@ -0,0 +1,36 @@
+# auth_context.py
+import threading
+import streamlit as st
+
+CONTEXT_KEY = "_auth_context"
+
+
+class AuthContext:
+    """Who the current script run is for, resolved once, and how many auth API calls that took"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.user = None
+        self.resolved = False
+        self.network_calls = 0
+
+    def set_user(self, user):
+        self.user = user
+        self.resolved = True
+
+    def count_network_call(self):
+        # May be called from a prefetch thread
+        with self._lock:
+            self.network_calls += 1
+
+
+def begin_auth_context():
+    """Fresh context for a new script run"""
+    context = AuthContext()
+    st.session_state[CONTEXT_KEY] = context
+    return context
+
+
+def current_auth_context():
+    """This run's context, started on first use if app.main didn't"""
+    return st.session_state.get(CONTEXT_KEY) or begin_auth_context()
@@ -0,0 +1,62 @@
+# daily_rollup.py
+import pandas as pd
+
+# Session status -> per-day counter column
+STATUS_COLUMNS = {
+    "Completed": "completed_sessions",
+    "Early Stop": "early_stop_sessions",
+    "Work Completed": "work_only_sessions",
+}
+
+HOUR_COLUMNS = [f"hour_{h:02d}" for h in range(24)]
+
+ROLLUP_COLUMNS = [
+    "work_minutes", "break_minutes",
+    # Only sessions with work time, matching what the efficiency chart counts
+    "focus_work_minutes", "focus_break_minutes",
+    "sessions", *STATUS_COLUMNS.values(), *HOUR_COLUMNS,
+]
+
+
+def empty_rollup():
+    """Rollup frame with no days in it"""
+    rollup = pd.DataFrame(columns=ROLLUP_COLUMNS, dtype="int64")
+    rollup.index.name = "date"
+    return rollup
+
+
+def build_daily_rollup(frame):
+    """Aggregate raw session rows into one row per UTC date"""
+    if frame.empty:
+        return empty_rollup()
+
+    timestamps = pd.to_datetime(frame["timestamp"], utc=True)
+    focused = frame["work_minutes"] > 0
+    parts = pd.DataFrame({
+        "date": timestamps.dt.date,
+        # Sessions store minutes as int16; totals need the headroom of int64
+        "work_minutes": frame["work_minutes"].astype("int64"),
+        "break_minutes": frame["break_minutes"].astype("int64"),
+        "focus_work_minutes": frame["work_minutes"].where(focused, 0).astype("int64"),
+        "focus_break_minutes": frame["break_minutes"].where(focused, 0).astype("int64"),
+        "sessions": 1,
+    }, index=frame.index)
+    for status, column in STATUS_COLUMNS.items():
+        parts[column] = (frame["status"] == status).astype("int64")
+
+    hours = pd.crosstab(parts["date"], timestamps.dt.hour)
+    hours = hours.reindex(columns=range(24), fill_value=0)
+    hours.columns = HOUR_COLUMNS
+
+    rollup = parts.groupby("date").sum().join(hours)
+    return rollup[ROLLUP_COLUMNS].astype("int64")
+
+
+def apply_session_delta(rollup, added, removed=None):
+    """Fold added rows into a rollup and back out the old versions of updated rows"""
+    if not added.empty:
+        rollup = rollup.add(build_daily_rollup(added), fill_value=0)
+    if removed is not None and not removed.empty:
+        rollup = rollup.sub(build_daily_rollup(removed), fill_value=0)
+    rollup = rollup[rollup["sessions"] > 0].astype("int64")
+    return rollup.sort_index()
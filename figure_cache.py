@@ -0,0 +1,58 @@
+# figure_cache.py
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+# Bounds for the process-wide figure cache
+MAX_ENTRIES = 500
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    """LRU of built Plotly figures, bounded by entry count and approximate serialized size"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get_or_build(self, key, build):
+        """Return the figure cached under key, building and storing it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        fig = build()
+        size = len(fig.to_json())
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (fig, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        return fig
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Shared figure cache for every script session in this process"""
+    return FigureCache()
+
+
+def cached_figure(user_id, version, name, build, data, params=()):
+    """build(data), reused while the user's session cache version is unchanged.
+
+    data must be what that version of the session cache holds; params names anything else the figure depends on.
+    """
+    if version is None:
+        # Not read from the cache, so nothing identifies it
+        return build(data)
+    key = (user_id, version, name, params)
+    return get_figure_cache().get_or_build(key, lambda: build(data))
@@ -0,0 +1,5 @@
+-- Idempotency key for session writes replayed from the local outbox.
+-- Rows written before this migration keep a NULL key.
+alter table sessions add column if not exists client_key uuid;
+
+create unique index if not exists sessions_client_key_idx on sessions (client_key);
@@ -0,0 +1,25 @@
+-- Give active_timer real columns instead of the packed
+-- break_duration = break_minutes * 1000 + work_minutes integer.
+alter table active_timer add column if not exists work_minutes integer;
+alter table active_timer add column if not exists break_minutes integer;
+-- Seconds already spent in the phase when it was paused (status = 'paused')
+alter table active_timer add column if not exists elapsed_seconds integer not null default 0;
+-- Bumped on every write, so readers can tell whether the row changed
+alter table active_timer add column if not exists version bigint not null default 0;
+-- client_key of the sessions row a running break will complete
+alter table active_timer add column if not exists session_key uuid;
+
+-- Unpack existing rows without the old 60 / 120 minute clamps
+update active_timer
+set work_minutes = break_duration % 1000,
+    break_minutes = break_duration / 1000
+where break_duration is not null and work_minutes is null;
+
+-- Rows that never had the packed value: use the current phase's duration
+update active_timer
+set work_minutes = case when phase = 'Work' then duration_minutes else 25 end,
+    break_minutes = case when phase = 'Break' then duration_minutes else 5 end
+where work_minutes is null;
+
+-- break_duration is no longer written; drop it once no older app version is running:
+-- alter table active_timer drop column break_duration;
@@ -0,0 +1,106 @@
+-- One round trip per timer transition (start, pause, resume, work done, break done, stop, skip).
+-- Applies the active_timer write and the sessions write(s) in a single transaction.
+--
+--   p_timer_op        'upsert' | 'update' | 'delete' | null
+--   p_timer           active_timer values; 'update' only changes the keys present
+--   p_insert_session  sessions row to insert, skipped if its client_key already exists
+--   p_update_session  {"client_key": ..., "values": {...}} for an existing sessions row
+--   p_expected_version  only apply if active_timer.version still equals this
+--
+-- Returns {"ok": bool, "timer": row or null, "session_ids": [...]}. When the version check
+-- fails nothing is written and ok is false.
+create or replace function timer_transition(
+    p_user_id uuid,
+    p_action text,
+    p_timer_op text default null,
+    p_timer jsonb default null,
+    p_insert_session jsonb default null,
+    p_update_session jsonb default null,
+    p_expected_version bigint default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_timer jsonb;
+    v_session_ids bigint[] := '{}';
+    v_id bigint;
+begin
+    if p_timer_op = 'upsert' then
+        insert into active_timer as t (
+            user_id, phase, start_time, duration_minutes, status,
+            work_minutes, break_minutes, elapsed_seconds, version, session_key
+        )
+        select p_user_id, r.phase, r.start_time, r.duration_minutes, coalesce(r.status, 'running'),
+               r.work_minutes, r.break_minutes, coalesce(r.elapsed_seconds, 0), coalesce(r.version, 0), r.session_key
+        from jsonb_populate_record(null::active_timer, p_timer) r
+        on conflict (user_id) do update set
+            phase = excluded.phase,
+            start_time = excluded.start_time,
+            duration_minutes = excluded.duration_minutes,
+            status = excluded.status,
+            work_minutes = excluded.work_minutes,
+            break_minutes = excluded.break_minutes,
+            elapsed_seconds = excluded.elapsed_seconds,
+            version = excluded.version,
+            session_key = excluded.session_key
+        where p_expected_version is null or t.version = p_expected_version
+        returning to_jsonb(t.*) into v_timer;
+    elsif p_timer_op = 'update' then
+        update active_timer t
+        set (phase, start_time, duration_minutes, status, work_minutes, break_minutes,
+             elapsed_seconds, version, session_key) = (
+            select r.phase, r.start_time, r.duration_minutes, r.status, r.work_minutes, r.break_minutes,
+                   r.elapsed_seconds, r.version, r.session_key
+            from jsonb_populate_record(t, p_timer) r
+        )
+        where t.user_id = p_user_id
+          and (p_expected_version is null or t.version = p_expected_version)
+        returning to_jsonb(t.*) into v_timer;
+    elsif p_timer_op = 'delete' then
+        delete from active_timer t
+        where t.user_id = p_user_id
+          and (p_expected_version is null or t.version = p_expected_version)
+        returning to_jsonb(t.*) into v_timer;
+        -- Deleting a row that is already gone is fine unless a version was expected
+        if v_timer is null and p_expected_version is null then
+            v_timer := 'null'::jsonb;
+        end if;
+    end if;
+
+    if p_timer_op is not null and v_timer is null then
+        return jsonb_build_object('ok', false, 'action', p_action, 'timer', null, 'session_ids', '[]'::jsonb);
+    end if;
+
+    if p_insert_session is not null then
+        insert into sessions (user_id, work_minutes, break_minutes, status, "timestamp", client_key)
+        select p_user_id, r.work_minutes, r.break_minutes, r.status, r."timestamp", r.client_key
+        from jsonb_populate_record(null::sessions, p_insert_session) r
+        on conflict (client_key) do nothing
+        returning id into v_id;
+        if v_id is not null then
+            v_session_ids := v_session_ids || v_id;
+        end if;
+    end if;
+
+    if p_update_session is not null then
+        v_id := null;
+        update sessions s
+        set (work_minutes, break_minutes, status) = (
+            select r.work_minutes, r.break_minutes, r.status
+            from jsonb_populate_record(s, p_update_session -> 'values') r
+        )
+        where s.user_id = p_user_id and s.client_key = (p_update_session ->> 'client_key')::uuid
+        returning id into v_id;
+        if v_id is not null then
+            v_session_ids := v_session_ids || v_id;
+        end if;
+    end if;
+
+    return jsonb_build_object(
+        'ok', true,
+        'action', p_action,
+        'timer', case when v_timer = 'null'::jsonb then null else v_timer end,
+        'session_ids', to_jsonb(v_session_ids)
+    );
+end;
+$$;
@@ -0,0 +1,12 @@
+-- Per-user UI preferences (animations, intro splash), read before the first render of a session.
+create table if not exists user_settings (
+    user_id uuid primary key references auth.users (id) on delete cascade,
+    settings jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now()
+);
+
+alter table user_settings enable row level security;
+
+drop policy if exists "Users manage their own settings" on user_settings;
+create policy "Users manage their own settings" on user_settings
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
@@ -0,0 +1,135 @@
+-- Key every timer transition, so a replay whose first response was lost (the outbox resends it)
+-- returns the stored result instead of failing its own version check.
+create table if not exists timer_transition_log (
+    key uuid primary key,
+    user_id uuid not null,
+    result jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists timer_transition_log_user_idx on timer_transition_log (user_id, created_at);
+
+alter table timer_transition_log enable row level security;
+
+drop policy if exists "Users manage their own transitions" on timer_transition_log;
+create policy "Users manage their own transitions" on timer_transition_log
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- Same function as migrations/003 plus p_key
+drop function if exists timer_transition(uuid, text, text, jsonb, jsonb, jsonb, bigint);
+
+create or replace function timer_transition(
+    p_user_id uuid,
+    p_action text,
+    p_timer_op text default null,
+    p_timer jsonb default null,
+    p_insert_session jsonb default null,
+    p_update_session jsonb default null,
+    p_expected_version bigint default null,
+    p_key uuid default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_timer jsonb;
+    v_session_ids bigint[] := '{}';
+    v_id bigint;
+    v_result jsonb;
+begin
+    if p_key is not null then
+        -- Claim the key first: a concurrent call with the same key waits here, then sees it taken
+        insert into timer_transition_log (key, user_id, result) values (p_key, p_user_id, '{}'::jsonb)
+        on conflict (key) do nothing;
+        if not found then
+            select result into v_result from timer_transition_log where key = p_key and user_id = p_user_id;
+            return coalesce(v_result, jsonb_build_object('ok', false, 'action', p_action, 'timer', null,
+                                                         'session_ids', '[]'::jsonb));
+        end if;
+        -- A replay only ever comes within the outbox's retry window
+        delete from timer_transition_log where user_id = p_user_id and created_at < now() - interval '7 days';
+    end if;
+
+    if p_timer_op = 'upsert' then
+        insert into active_timer as t (
+            user_id, phase, start_time, duration_minutes, status,
+            work_minutes, break_minutes, elapsed_seconds, version, session_key
+        )
+        select p_user_id, r.phase, r.start_time, r.duration_minutes, coalesce(r.status, 'running'),
+               r.work_minutes, r.break_minutes, coalesce(r.elapsed_seconds, 0), coalesce(r.version, 0), r.session_key
+        from jsonb_populate_record(null::active_timer, p_timer) r
+        on conflict (user_id) do update set
+            phase = excluded.phase,
+            start_time = excluded.start_time,
+            duration_minutes = excluded.duration_minutes,
+            status = excluded.status,
+            work_minutes = excluded.work_minutes,
+            break_minutes = excluded.break_minutes,
+            elapsed_seconds = excluded.elapsed_seconds,
+            version = excluded.version,
+            session_key = excluded.session_key
+        where p_expected_version is null or t.version = p_expected_version
+        returning to_jsonb(t.*) into v_timer;
+    elsif p_timer_op = 'update' then
+        update active_timer t
+        set (phase, start_time, duration_minutes, status, work_minutes, break_minutes,
+             elapsed_seconds, version, session_key) = (
+            select r.phase, r.start_time, r.duration_minutes, r.status, r.work_minutes, r.break_minutes,
+                   r.elapsed_seconds, r.version, r.session_key
+            from jsonb_populate_record(t, p_timer) r
+        )
+        where t.user_id = p_user_id
+          and (p_expected_version is null or t.version = p_expected_version)
+        returning to_jsonb(t.*) into v_timer;
+    elsif p_timer_op = 'delete' then
+        delete from active_timer t
+        where t.user_id = p_user_id
+          and (p_expected_version is null or t.version = p_expected_version)
+        returning to_jsonb(t.*) into v_timer;
+        -- Deleting a row that is already gone is fine unless a version was expected
+        if v_timer is null and p_expected_version is null then
+            v_timer := 'null'::jsonb;
+        end if;
+    end if;
+
+    if p_timer_op is not null and v_timer is null then
+        v_result := jsonb_build_object('ok', false, 'action', p_action, 'timer', null, 'session_ids', '[]'::jsonb);
+    else
+        if p_insert_session is not null then
+            insert into sessions (user_id, work_minutes, break_minutes, status, "timestamp", client_key)
+            select p_user_id, r.work_minutes, r.break_minutes, r.status, r."timestamp", r.client_key
+            from jsonb_populate_record(null::sessions, p_insert_session) r
+            on conflict (client_key) do nothing
+            returning id into v_id;
+            if v_id is not null then
+                v_session_ids := v_session_ids || v_id;
+            end if;
+        end if;
+
+        if p_update_session is not null then
+            v_id := null;
+            update sessions s
+            set (work_minutes, break_minutes, status) = (
+                select r.work_minutes, r.break_minutes, r.status
+                from jsonb_populate_record(s, p_update_session -> 'values') r
+            )
+            where s.user_id = p_user_id and s.client_key = (p_update_session ->> 'client_key')::uuid
+            returning id into v_id;
+            if v_id is not null then
+                v_session_ids := v_session_ids || v_id;
+            end if;
+        end if;
+
+        v_result := jsonb_build_object(
+            'ok', true,
+            'action', p_action,
+            'timer', case when v_timer = 'null'::jsonb then null else v_timer end,
+            'session_ids', to_jsonb(v_session_ids)
+        );
+    end if;
+
+    if p_key is not null then
+        update timer_transition_log set result = v_result where key = p_key;
+    end if;
+    return v_result;
+end;
+$$;
@@ -0,0 +1,154 @@
+-- The database assigns timer versions. A per-user counter is bumped by every timer write,
+-- including deletes, and survives stop + start, so a version is never reused (no ABA):
+-- a tab holding a version from an earlier timer can never pass the compare-and-set.
+create table if not exists timer_versions (
+    user_id uuid primary key,
+    version bigint not null default 0
+);
+
+insert into timer_versions (user_id, version)
+select user_id, version from active_timer
+on conflict (user_id) do nothing;
+
+alter table timer_versions enable row level security;
+
+-- timer_transition runs as the caller, and creates, locks (select ... for update) and bumps the
+-- caller's counter row, so users need insert and update on their own row as well as select
+drop policy if exists "Users read their own timer version" on timer_versions;
+create policy "Users read their own timer version" on timer_versions
+    for select using (auth.uid() = user_id);
+
+drop policy if exists "Users create their own timer version" on timer_versions;
+create policy "Users create their own timer version" on timer_versions
+    for insert with check (auth.uid() = user_id);
+
+drop policy if exists "Users bump their own timer version" on timer_versions;
+create policy "Users bump their own timer version" on timer_versions
+    for update using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- Same parameters as migrations/005; p_expected_version is now compared with the counter,
+-- any "version" in p_timer is ignored, and the result carries the new "version".
+drop function if exists timer_transition(uuid, text, text, jsonb, jsonb, jsonb, bigint, uuid);
+
+create or replace function timer_transition(
+    p_user_id uuid,
+    p_action text,
+    p_timer_op text default null,
+    p_timer jsonb default null,
+    p_insert_session jsonb default null,
+    p_update_session jsonb default null,
+    p_expected_version bigint default null,
+    p_key uuid default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_version bigint;
+    v_timer jsonb;
+    v_session_ids bigint[] := '{}';
+    v_id bigint;
+    v_result jsonb;
+begin
+    if p_key is not null then
+        -- Claim the key first: a concurrent call with the same key waits here, then sees it taken
+        insert into timer_transition_log (key, user_id, result) values (p_key, p_user_id, '{}'::jsonb)
+        on conflict (key) do nothing;
+        if not found then
+            select result into v_result from timer_transition_log where key = p_key and user_id = p_user_id;
+            return coalesce(v_result, jsonb_build_object('ok', false, 'action', p_action, 'timer', null,
+                                                         'version', null, 'session_ids', '[]'::jsonb));
+        end if;
+        -- A replay only ever comes within the outbox's retry window
+        delete from timer_transition_log where user_id = p_user_id and created_at < now() - interval '7 days';
+    end if;
+
+    -- The counter row serialises this user's transitions
+    insert into timer_versions (user_id, version)
+    values (p_user_id, coalesce((select version from active_timer where user_id = p_user_id), 0))
+    on conflict (user_id) do nothing;
+    select version into v_version from timer_versions where user_id = p_user_id for update;
+
+    if (p_expected_version is not null and v_version <> p_expected_version)
+       or (p_timer_op = 'update' and not exists (select 1 from active_timer where user_id = p_user_id)) then
+        v_result := jsonb_build_object('ok', false, 'action', p_action, 'timer', null,
+                                       'version', v_version, 'session_ids', '[]'::jsonb);
+    else
+        if p_timer_op is not null then
+            v_version := v_version + 1;
+            update timer_versions set version = v_version where user_id = p_user_id;
+        end if;
+
+        if p_timer_op = 'upsert' then
+            insert into active_timer as t (
+                user_id, phase, start_time, duration_minutes, status,
+                work_minutes, break_minutes, elapsed_seconds, version, session_key
+            )
+            select p_user_id, r.phase, r.start_time, r.duration_minutes, coalesce(r.status, 'running'),
+                   r.work_minutes, r.break_minutes, coalesce(r.elapsed_seconds, 0), v_version, r.session_key
+            from jsonb_populate_record(null::active_timer, p_timer) r
+            on conflict (user_id) do update set
+                phase = excluded.phase,
+                start_time = excluded.start_time,
+                duration_minutes = excluded.duration_minutes,
+                status = excluded.status,
+                work_minutes = excluded.work_minutes,
+                break_minutes = excluded.break_minutes,
+                elapsed_seconds = excluded.elapsed_seconds,
+                version = excluded.version,
+                session_key = excluded.session_key
+            returning to_jsonb(t.*) into v_timer;
+        elsif p_timer_op = 'update' then
+            update active_timer t
+            set (phase, start_time, duration_minutes, status, work_minutes, break_minutes,
+                 elapsed_seconds, session_key) = (
+                select r.phase, r.start_time, r.duration_minutes, r.status, r.work_minutes, r.break_minutes,
+                       r.elapsed_seconds, r.session_key
+                from jsonb_populate_record(t, p_timer) r
+            ),
+                version = v_version
+            where t.user_id = p_user_id
+            returning to_jsonb(t.*) into v_timer;
+        elsif p_timer_op = 'delete' then
+            delete from active_timer where user_id = p_user_id;
+        end if;
+
+        if p_insert_session is not null then
+            insert into sessions (user_id, work_minutes, break_minutes, status, "timestamp", client_key)
+            select p_user_id, r.work_minutes, r.break_minutes, r.status, r."timestamp", r.client_key
+            from jsonb_populate_record(null::sessions, p_insert_session) r
+            on conflict (client_key) do nothing
+            returning id into v_id;
+            if v_id is not null then
+                v_session_ids := v_session_ids || v_id;
+            end if;
+        end if;
+
+        if p_update_session is not null then
+            v_id := null;
+            update sessions s
+            set (work_minutes, break_minutes, status) = (
+                select r.work_minutes, r.break_minutes, r.status
+                from jsonb_populate_record(s, p_update_session -> 'values') r
+            )
+            where s.user_id = p_user_id and s.client_key = (p_update_session ->> 'client_key')::uuid
+            returning id into v_id;
+            if v_id is not null then
+                v_session_ids := v_session_ids || v_id;
+            end if;
+        end if;
+
+        v_result := jsonb_build_object(
+            'ok', true,
+            'action', p_action,
+            'timer', v_timer,
+            'version', v_version,
+            'session_ids', to_jsonb(v_session_ids)
+        );
+    end if;
+
+    if p_key is not null then
+        update timer_transition_log set result = v_result where key = p_key;
+    end if;
+    return v_result;
+end;
+$$;
@@ -0,0 +1,137 @@
+# outbox.py
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_OUTBOX_PATH = "outbox.sqlite3"
+
+
+def new_client_key():
+    """Idempotency key for a sessions row (or a transition without one), generated before it is ever sent"""
+    return str(uuid.uuid4())
+
+
+class Outbox:
+    """Durable SQLite log of session and timer writes, kept until the backend has acknowledged them"""
+
+    def __init__(self, path=DEFAULT_OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                client_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+        """)
+        # Writes the backend kept rejecting, set aside so they stop holding up their user's later writes
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                seq INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                client_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                dead_at REAL NOT NULL
+            )
+        """)
+
+    def append(self, user_id, kind, client_key, payload):
+        """Record a write before anything is sent; returns its sequence"""
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (user_id, kind, client_key, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (str(user_id), kind, client_key, json.dumps(payload, default=str), time.time()),
+            )
+            return cur.lastrowid
+
+    def pending(self, limit=100, skip_users=(), user_id=None):
+        """Oldest unacknowledged writes, in the order they were recorded, leaving out skip_users"""
+        skip_users = [str(skipped) for skipped in skip_users]
+        conditions = [f"user_id NOT IN ({', '.join('?' for _ in skip_users)})"] if skip_users else []
+        params = list(skip_users)
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(str(user_id))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT seq, user_id, kind, client_key, payload, attempts FROM outbox {where} ORDER BY seq LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [
+            {"seq": seq, "user_id": user_id, "kind": kind, "client_key": client_key,
+             "payload": json.loads(payload), "attempts": attempts}
+            for seq, user_id, kind, client_key, payload, attempts in rows
+        ]
+
+    def pending_users(self):
+        """Users with writes still waiting"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT user_id FROM outbox")]
+
+    def acknowledge(self, seqs):
+        """Forget writes the backend has confirmed"""
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def record_failure(self, seq, error):
+        """Note a failed delivery attempt; the entry stays queued. Returns its attempts so far"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE seq = ?", (str(error), seq)
+            )
+            row = self._conn.execute("SELECT attempts FROM outbox WHERE seq = ?", (seq,)).fetchone()
+        return row[0] if row else 0
+
+    def dead_letter(self, seq):
+        """Move a write the backend keeps rejecting out of the queue, keeping it for inspection"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO dead_letter (seq, user_id, kind, client_key, payload, created_at, attempts, last_error, dead_at) "
+                    "SELECT seq, user_id, kind, client_key, payload, created_at, attempts, last_error, ? FROM outbox WHERE seq = ?",
+                    (time.time(), seq),
+                )
+                self._conn.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def dead_letters(self, user_id=None):
+        """Writes that were set aside, oldest first"""
+        where, params = ("WHERE user_id = ?", (str(user_id),)) if user_id is not None else ("", ())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT seq, user_id, kind, client_key, payload, attempts, last_error FROM dead_letter {where} ORDER BY seq",
+                params,
+            ).fetchall()
+        return [
+            {"seq": seq, "user_id": user_id, "kind": kind, "client_key": client_key,
+             "payload": json.loads(payload), "attempts": attempts, "last_error": last_error}
+            for seq, user_id, kind, client_key, payload, attempts, last_error in rows
+        ]
+
+    def pending_count(self, user_id=None):
+        """How many writes are still waiting, optionally for one user"""
+        with self._lock:
+            if user_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE user_id = ?", (str(user_id),)).fetchone()[0]
@@ -0,0 +1,37 @@
+# page_data.py
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+# Reads in flight at once across every script session in the process
+FETCH_WORKERS = 16
+
+PREFETCH_KEY = "_prefetched"
+
+
+@st.cache_resource
+def get_fetch_pool():
+    """Shared thread pool for the independent reads of a page render"""
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="page-fetch")
+
+
+def begin_prefetch():
+    """Start a new run; anything prefetched by the previous one is stale"""
+    st.session_state[PREFETCH_KEY] = {}
+
+
+def prefetch(name, fn, *args):
+    """Run fn(*args) on the pool; it runs off the script thread, so it must not call st.*"""
+    st.session_state.setdefault(PREFETCH_KEY, {})[name] = (args, get_fetch_pool().submit(fn, *args))
+
+
+def take_prefetched(name, fn, *args):
+    """Result of this run's prefetch with the same arguments, or fn(*args) if there was none"""
+    entry = st.session_state.get(PREFETCH_KEY, {}).pop(name, None)
+    if entry and entry[0] == args:
+        return entry[1].result()
+    return fn(*args)
+
+
+def discard_prefetched(name):
+    """Drop a prefetch whose data was invalidated before it was used"""
+    st.session_state.get(PREFETCH_KEY, {}).pop(name, None)
@@ -0,0 +1,224 @@
+# session_cache.py
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import streamlit as st
+from storage import get_storage
+from daily_rollup import build_daily_rollup, apply_session_delta
+from streak_index import StreakIndex
+
+# How often to look for rows written by other processes; local writes invalidate explicitly
+CACHE_TTL_SECONDS = 600
+
+# Only the columns the dashboard reads; user_id is implied by the filter
+SESSION_COLUMNS = ["id", "timestamp", "work_minutes", "break_minutes", "status"]
+
+# Minutes fit in int16; a value outside it widens that column to int32 instead of wrapping
+INT16_MAX = np.iinfo(np.int16).max
+
+# Rows per request; stays under PostgREST's max-rows cap
+PAGE_SIZE = 1000
+
+# "Work Completed" rows younger than this may still get their break filled in elsewhere
+OPEN_SESSION_WINDOW = timedelta(hours=24)
+
+
+# Snapshot versions are unique across users, so (user_id, version) names one exact frame
+_versions = itertools.count(1)
+
+
+class SessionCache:
+    """Process-wide per-user session snapshots, kept current with delta syncs"""
+
+    def __init__(self, storage, ttl=CACHE_TTL_SECONDS):
+        self.storage = storage
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._generations = {}
+        self._dirty_ids = {}
+
+    def get_versioned(self, user_id):
+        """Return (frame, version) for a user's whole history; the version changes whenever the rows do"""
+        snapshot = self._current(user_id)
+        return snapshot["frame"], snapshot["version"]
+
+    def get_rollup(self, user_id):
+        """Return (rollup, version): the user's per-day aggregates, kept in step with the snapshot"""
+        snapshot = self._current(user_id)
+        return snapshot["rollup"], snapshot["version"]
+
+    def get_streaks(self, user_id):
+        """Return the user's StreakIndex, kept in step with the snapshot"""
+        return self._current(user_id)["streaks"]
+
+    def _current(self, user_id):
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            fresh = (
+                snapshot is not None
+                and snapshot["generation"] == self._generations.get(user_id, 0)
+                and time.monotonic() - snapshot["synced_at"] < self.ttl
+            )
+        if not fresh:
+            snapshot = self._sync(user_id, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id, session_ids=()):
+        """Flag a user's snapshot for a delta sync; updated rows are listed explicitly"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._dirty_ids.setdefault(user_id, set()).update(i for i in session_ids if i is not None)
+
+    def resync(self, user_id):
+        """Forget a user's snapshot so the next read does a full reload"""
+        with self._lock:
+            self._snapshots.pop(user_id, None)
+            self._dirty_ids.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def _sync(self, user_id, snapshot):
+        with self._lock:
+            generation = self._generations.get(user_id, 0)
+            dirty_ids = self._dirty_ids.pop(user_id, set())
+
+        streak_delta = None
+        try:
+            if snapshot is None or snapshot["max_id"] is None:
+                frame = fetch_session_rows(self.storage, user_id)
+                rollup = build_daily_rollup(frame)
+                streaks = StreakIndex.from_frame(frame)
+            else:
+                refetch_ids = dirty_ids | set(_open_session_ids(snapshot["frame"]))
+                delta = fetch_session_rows(self.storage, user_id, after_id=snapshot["max_id"], session_ids=refetch_ids)
+                previous = snapshot["frame"]
+                replaced = previous[previous["id"].isin(delta["id"])] if not delta.empty else None
+                rollup = apply_session_delta(snapshot["rollup"], delta, replaced)
+                frame = _merge_rows(previous, delta)
+                # Updated in place, so only once this sync is known to win (see below)
+                streaks = snapshot["streaks"]
+                streak_delta = (delta, replaced)
+        except Exception:
+            # Put the ids back so a later sync still refetches them
+            with self._lock:
+                self._dirty_ids.setdefault(user_id, set()).update(dirty_ids)
+            raise
+
+        unchanged = snapshot is not None and frame is snapshot["frame"]
+        new_snapshot = {
+            "frame": frame,
+            "version": snapshot["version"] if unchanged else next(_versions),
+            "rollup": rollup,
+            "streaks": streaks,
+            "max_id": int(frame["id"].max()) if not frame.empty else None,
+            "generation": generation,
+            "synced_at": time.monotonic(),
+        }
+        with self._lock:
+            # Don't overwrite a snapshot that was resynced or synced by another run meanwhile
+            if self._snapshots.get(user_id) is snapshot:
+                if streak_delta:
+                    streaks.apply(*streak_delta)
+                self._snapshots[user_id] = new_snapshot
+        return new_snapshot
+
+
+def _merge_rows(frame, delta):
+    if delta.empty:
+        return frame
+    if frame.empty:
+        return delta
+    merged = pd.concat([frame, delta], ignore_index=True)
+    return compact_sessions(merged.drop_duplicates("id", keep="last").sort_values("id", ignore_index=True))
+
+
+def compact_sessions(frame):
+    """Columnar session frame: int64 id, UTC datetime64 timestamp, small-int minutes, categorical status"""
+    return pd.DataFrame({
+        "id": frame["id"].astype("int64"),
+        "timestamp": pd.to_datetime(frame["timestamp"], utc=True, format="ISO8601"),
+        "work_minutes": _minutes(frame["work_minutes"]),
+        "break_minutes": _minutes(frame["break_minutes"]),
+        # Category codes are rebuilt after a concat of frames whose categories differ
+        "status": frame["status"].astype("category"),
+    }, index=frame.index)
+
+
+def empty_sessions():
+    """Session frame with no rows but the compact dtypes"""
+    return compact_sessions(pd.DataFrame(columns=SESSION_COLUMNS))
+
+
+def _minutes(column):
+    values = column.fillna(0).astype("int64")
+    if values.empty or values.abs().max() <= INT16_MAX:
+        return values.astype("int16")
+    return values.astype("int32")
+
+
+def _open_session_ids(frame):
+    if frame.empty:
+        return []
+    cutoff = datetime.now(timezone.utc) - OPEN_SESSION_WINDOW
+    open_rows = frame[(frame["status"] == "Work Completed") & (frame["timestamp"] >= cutoff)]
+    return open_rows["id"].tolist()
+
+
+def fetch_session_rows(storage, user_id, after_id=None, session_ids=()):
+    """Load sessions for one user; with after_id, only newer rows plus the listed ids"""
+    pages = list(iter_session_pages(storage, user_id, after_id))
+    if after_id is not None and session_ids:
+        pages.append(_fetch_sessions_by_id(storage, user_id, session_ids))
+    pages = [page for page in pages if not page.empty]
+    if not pages:
+        return empty_sessions()
+    if len(pages) == 1:
+        return pages[0]
+    # An updated row can also be newer than after_id; keep one copy of it
+    return compact_sessions(pd.concat(pages, ignore_index=True).drop_duplicates("id", keep="last"))
+
+
+def iter_session_pages(storage, user_id, after_id=None, page_size=PAGE_SIZE):
+    """Yield projected frames of up to page_size rows, walking the history by id"""
+    while True:
+        rows = storage.fetch_sessions_page(user_id, SESSION_COLUMNS, after_id, page_size)
+        if not rows:
+            return
+        yield compact_sessions(pd.DataFrame(rows, columns=SESSION_COLUMNS))
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]["id"]
+
+
+def _fetch_sessions_by_id(storage, user_id, session_ids):
+    rows = storage.fetch_sessions_by_id(user_id, SESSION_COLUMNS, session_ids)
+    return compact_sessions(pd.DataFrame(rows, columns=SESSION_COLUMNS))
+
+
+@st.cache_resource
+def get_session_cache():
+    """Shared cache instance for every script session in this process"""
+    return SessionCache(get_storage())
+
+
+def get_user_rollup(user_id):
+    """Cached per-day aggregates for a user's whole history, with the snapshot version they belong to"""
+    return get_session_cache().get_rollup(user_id)
+
+
+def get_user_streaks(user_id):
+    """Cached streak and consistency index for a user"""
+    return get_session_cache().get_streaks(user_id)
+
+
+def invalidate_user_sessions(user_id, session_ids=()):
+    """Mark a user's cached sessions as changed so the next read syncs the delta"""
+    get_session_cache().invalidate(user_id, session_ids)
+
+
+def resync_user_sessions(user_id):
+    """Throw away a user's snapshot and reload their full history on next read"""
+    get_session_cache().resync(user_id)
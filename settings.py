@@ -0,0 +1,64 @@
+# settings.py
+import streamlit as st
+from storage import get_storage
+
+# Per-user UI preferences, saved with the user; defaults can be overridden under [ui] in secrets
+DEFAULTS = {
+    "animations_enabled": True,
+    "show_intro": True,
+}
+
+# Whose saved preferences this browser session has loaded
+SETTINGS_USER_KEY = "_settings_user"
+
+
+def _configured_default(key):
+    try:
+        return st.secrets.get("ui", {}).get(key, DEFAULTS[key])
+    except Exception:
+        # No secrets file in local dev
+        return DEFAULTS[key]
+
+
+def debug_enabled():
+    """Whether to show diagnostics such as per-run auth API calls; [ui] debug in secrets"""
+    try:
+        return bool(st.secrets.get("ui", {}).get("debug", False))
+    except Exception:
+        return False
+
+
+def get_setting(key):
+    """Current value of a UI preference for this browser session"""
+    if key not in st.session_state:
+        st.session_state[key] = _configured_default(key)
+    return st.session_state[key]
+
+
+def load_user_settings(user):
+    """Adopt the user's saved preferences once per browser session, before anything renders with them"""
+    if st.session_state.get(SETTINGS_USER_KEY) == user.id:
+        return
+    try:
+        saved = get_storage().get_user_settings(user.id)
+    except Exception:
+        saved = {}
+    for key in DEFAULTS:
+        st.session_state[key] = saved.get(key, _configured_default(key))
+    st.session_state[SETTINGS_USER_KEY] = user.id
+
+
+def _save_user_settings(user_id):
+    try:
+        get_storage().save_user_settings(user_id, {key: st.session_state[key] for key in DEFAULTS})
+    except Exception as e:
+        st.toast(f"❌ Failed to save settings: {e}")
+
+
+def settings_panel(user):
+    """Sidebar controls for the UI preferences; changes are saved for the user"""
+    load_user_settings(user)
+
+    with st.sidebar.expander("⚙️ Display Settings"):
+        st.toggle("Animate insights", key="animations_enabled", on_change=_save_user_settings, args=(user.id,))
+        st.toggle("Show intro splash", key="show_intro", on_change=_save_user_settings, args=(user.id,))
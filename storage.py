@@ -0,0 +1,342 @@
+# storage.py
+import json
+import sqlite3
+import threading
+import time
+import httpx
+import streamlit as st
+from supabase_client import get_rest_clients, get_service_rest
+from token_cache import get_token_cache
+
+DEFAULT_SQLITE_PATH = "pomodash.sqlite3"
+
+# Columns of a timer row (see migrations/003); the backend assigns "version" (see migrations/006)
+TIMER_COLUMNS = (
+    "phase", "start_time", "duration_minutes", "status", "work_minutes",
+    "break_minutes", "elapsed_seconds", "version", "session_key",
+)
+SESSION_UPDATE_COLUMNS = ("work_minutes", "break_minutes", "status")
+
+# How long applied transition keys are kept; a replay only ever comes within the outbox's retry window
+TRANSITION_LOG_SECONDS = 7 * 24 * 3600
+
+# Error codes worth retrying as is: SQLSTATE connection / resource / shutdown / serialization
+# classes, and gateway statuses. Anything else (RLS, constraints, a missing function) is a rejection.
+# An expired JWT (PGRST301/PGRST303) works again once the user's next run has refreshed it.
+TRANSIENT_ERROR_CODES = ("08", "40001", "40P01", "53", "57P", "502", "503", "504", "PGRST301", "PGRST303")
+
+
+class UserNotSignedIn(Exception):
+    """No live access token for the user in this process, so nothing can be sent as them yet"""
+
+
+class SupabaseStorage:
+    """sessions / active_timer access through the Supabase REST API.
+
+    client_for(user_id) gives the PostgREST client for one user's requests: one sending that user's
+    own JWT (see signed_in_clients), or a service-role client that may act for anyone, which
+    list_active_timers asks for with user_id None. Every query also filters on user_id.
+    """
+
+    def __init__(self, client_for):
+        self._client_for = client_for
+
+    def is_transient(self, error):
+        """Whether a failed call may succeed if simply retried, rather than being rejected"""
+        if isinstance(error, (httpx.TransportError, UserNotSignedIn)):
+            # Waiting for the user's tab to come back with a live token counts as transient too
+            return True
+        return str(getattr(error, "code", "") or "").startswith(TRANSIENT_ERROR_CODES)
+
+    # ---------------------- Sessions ----------------------
+    def fetch_sessions_page(self, user_id, columns, after_id=None, limit=1000):
+        query = self._client_for(user_id).table("sessions").select(",".join(columns)).eq("user_id", user_id)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        return query.order("id").limit(limit).execute().data or []
+
+    def fetch_sessions_by_id(self, user_id, columns, session_ids):
+        return (
+            self._client_for(user_id)
+            .table("sessions")
+            .select(",".join(columns))
+            .eq("user_id", user_id)
+            .in_("id", sorted(session_ids))
+            .execute()
+            .data or []
+        )
+
+    # ---------------------- Active timer ----------------------
+    def get_active_timer(self, user_id):
+        res = self._client_for(user_id).table("active_timer").select("*").eq("user_id", user_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def list_active_timers(self, status="running"):
+        return self._client_for(None).table("active_timer").select("*").eq("status", status).execute().data or []
+
+    def get_timer_version(self, user_id):
+        """The user's current timer version: one small row, cheap enough to poll"""
+        client = self._client_for(user_id)
+        res = client.table("timer_versions").select("version").eq("user_id", user_id).limit(1).execute()
+        return res.data[0]["version"] if res.data else 0
+
+    def transition(self, user_id, transition):
+        """Apply one timer transition in a single transaction via the timer_transition function (migrations/006)"""
+        return self._client_for(user_id).rpc("timer_transition", {
+            "p_user_id": str(user_id),
+            "p_action": transition["action"],
+            "p_timer_op": transition.get("timer_op"),
+            "p_timer": transition.get("timer"),
+            "p_insert_session": transition.get("insert_session"),
+            "p_update_session": transition.get("update_session"),
+            "p_expected_version": transition.get("expected_version"),
+            "p_key": transition.get("key"),
+        }).execute().data
+
+    # ---------------------- User settings ----------------------
+    def get_user_settings(self, user_id):
+        client = self._client_for(user_id)
+        res = client.table("user_settings").select("settings").eq("user_id", user_id).limit(1).execute()
+        return res.data[0]["settings"] if res.data else {}
+
+    def save_user_settings(self, user_id, settings):
+        self._client_for(user_id).table("user_settings").upsert({"user_id": user_id, "settings": settings}).execute()
+
+
+class SQLiteStorage:
+    """Embedded single-file backend with the same operations, for self-hosting and local testing"""
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                work_minutes INTEGER NOT NULL DEFAULT 0,
+                break_minutes INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                client_key TEXT UNIQUE
+            );
+            CREATE INDEX IF NOT EXISTS sessions_user_id_idx ON sessions (user_id, id);
+            CREATE TABLE IF NOT EXISTS active_timer (
+                user_id TEXT PRIMARY KEY,
+                phase TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                duration_minutes INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                work_minutes INTEGER,
+                break_minutes INTEGER,
+                elapsed_seconds INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0,
+                session_key TEXT
+            );
+            CREATE TABLE IF NOT EXISTS timer_transition_log (
+                key TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS timer_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS user_settings (
+                user_id TEXT PRIMARY KEY,
+                settings TEXT NOT NULL DEFAULT '{}'
+            );
+        """)
+
+    def is_transient(self, error):
+        """Whether a failed call may succeed if simply retried, rather than being rejected"""
+        return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    # ---------------------- Sessions ----------------------
+    def fetch_sessions_page(self, user_id, columns, after_id=None, limit=1000):
+        return self._query(
+            f"SELECT {', '.join(columns)} FROM sessions WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (str(user_id), after_id if after_id is not None else -1, limit),
+        )
+
+    def fetch_sessions_by_id(self, user_id, columns, session_ids):
+        ids = sorted(session_ids)
+        placeholders = ", ".join("?" for _ in ids)
+        return self._query(
+            f"SELECT {', '.join(columns)} FROM sessions WHERE user_id = ? AND id IN ({placeholders})",
+            (str(user_id), *ids),
+        )
+
+    def _insert_session(self, row):
+        # Caller holds the lock; returns the new id, or None if the client_key already landed
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO sessions (user_id, work_minutes, break_minutes, status, timestamp, client_key) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(row["user_id"]), row["work_minutes"], row["break_minutes"], row["status"],
+             row["timestamp"], row.get("client_key")),
+        )
+        return cur.lastrowid if cur.rowcount else None
+
+    # ---------------------- Active timer ----------------------
+    def get_active_timer(self, user_id):
+        rows = self._query("SELECT * FROM active_timer WHERE user_id = ?", (str(user_id),))
+        return rows[0] if rows else None
+
+    def list_active_timers(self, status="running"):
+        return self._query("SELECT * FROM active_timer WHERE status = ?", (status,))
+
+    def get_timer_version(self, user_id):
+        rows = self._query("SELECT version FROM timer_versions WHERE user_id = ?", (str(user_id),))
+        return rows[0]["version"] if rows else 0
+
+    def transition(self, user_id, transition):
+        """Same contract as the timer_transition function: all of it lands, or none of it does"""
+        user_id = str(user_id)
+        key = transition.get("key")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                logged = key and self._conn.execute(
+                    "SELECT user_id, result FROM timer_transition_log WHERE key = ?", (key,)
+                ).fetchone()
+                if logged:
+                    # A replay: answer as the first call did
+                    self._conn.execute("ROLLBACK")
+                    return json.loads(logged["result"]) if logged["user_id"] == user_id else _rejected(transition)
+                # Rejections return before anything is written, so the result can always be committed
+                result = self._apply_transition(user_id, transition)
+                if key:
+                    self._conn.execute("DELETE FROM timer_transition_log WHERE user_id = ? AND created_at < ?",
+                                       (user_id, time.time() - TRANSITION_LOG_SECONDS))
+                    self._conn.execute(
+                        "INSERT INTO timer_transition_log (key, user_id, result, created_at) VALUES (?, ?, ?, ?)",
+                        (key, user_id, json.dumps(result), time.time()),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _apply_transition(self, user_id, transition):
+        op = transition.get("timer_op")
+        # The version comes from the per-user counter, never from the caller
+        values = {column: value for column, value in (transition.get("timer") or {}).items()
+                  if column in TIMER_COLUMNS and column != "version"}
+        expected = transition.get("expected_version")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO timer_versions (user_id, version) "
+            "VALUES (?, COALESCE((SELECT version FROM active_timer WHERE user_id = ?), 0))",
+            (user_id, user_id),
+        )
+        version = self._conn.execute("SELECT version FROM timer_versions WHERE user_id = ?", (user_id,)).fetchone()[0]
+        current = self._conn.execute("SELECT * FROM active_timer WHERE user_id = ?", (user_id,)).fetchone()
+        current = dict(current) if current else None
+        if (expected is not None and version != expected) or (op == "update" and current is None):
+            return _rejected(transition, version)
+        if op:
+            version += 1
+            self._conn.execute("UPDATE timer_versions SET version = ? WHERE user_id = ?", (version, user_id))
+
+        timer = None
+        if op == "upsert":
+            timer = {column: values.get(column) for column in TIMER_COLUMNS}
+            timer["status"] = timer["status"] or "running"
+            timer["elapsed_seconds"] = timer["elapsed_seconds"] or 0
+            timer["version"] = version
+            updates = ", ".join(f"{column} = excluded.{column}" for column in TIMER_COLUMNS)
+            self._conn.execute(
+                f"INSERT INTO active_timer (user_id, {', '.join(TIMER_COLUMNS)}) "
+                f"VALUES (?{', ?' * len(TIMER_COLUMNS)}) ON CONFLICT (user_id) DO UPDATE SET {updates}",
+                (user_id, *timer.values()),
+            )
+            timer = {**(current or {}), "user_id": user_id, **timer}
+        elif op == "update":
+            values["version"] = version
+            assignments = ", ".join(f"{column} = ?" for column in values)
+            self._conn.execute(f"UPDATE active_timer SET {assignments} WHERE user_id = ?", (*values.values(), user_id))
+            timer = {**current, **values}
+        elif op == "delete":
+            self._conn.execute("DELETE FROM active_timer WHERE user_id = ?", (user_id,))
+
+        session_ids = []
+        if transition.get("insert_session"):
+            session_id = self._insert_session({**transition["insert_session"], "user_id": user_id})
+            if session_id is not None:
+                session_ids.append(session_id)
+        update = transition.get("update_session")
+        if update:
+            values = {column: value for column, value in update["values"].items() if column in SESSION_UPDATE_COLUMNS}
+            if values:
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                self._conn.execute(
+                    f"UPDATE sessions SET {assignments} WHERE user_id = ? AND client_key = ?",
+                    (*values.values(), user_id, update["client_key"]),
+                )
+            row = self._conn.execute(
+                "SELECT id FROM sessions WHERE user_id = ? AND client_key = ?", (user_id, update["client_key"])
+            ).fetchone()
+            if row:
+                session_ids.append(row["id"])
+        return {"ok": True, "action": transition["action"], "timer": timer, "version": version,
+                "session_ids": session_ids}
+
+    # ---------------------- User settings ----------------------
+    def get_user_settings(self, user_id):
+        rows = self._query("SELECT settings FROM user_settings WHERE user_id = ?", (str(user_id),))
+        return json.loads(rows[0]["settings"]) if rows else {}
+
+    def save_user_settings(self, user_id, settings):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_settings (user_id, settings) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET settings = excluded.settings",
+                (str(user_id), json.dumps(settings)),
+            )
+
+
+def _rejected(transition, version=None):
+    return {"ok": False, "action": transition["action"], "timer": None, "version": version, "session_ids": []}
+
+
+def _storage_config():
+    try:
+        return dict(st.secrets.get("storage", {}))
+    except Exception:
+        return {}
+
+
+@st.cache_resource
+def get_storage():
+    """Process-wide storage backend; pick it with [storage] backend = "supabase" | "sqlite" in secrets"""
+    config = _storage_config()
+    if config.get("backend", "supabase") == "sqlite":
+        return SQLiteStorage(config.get("path", DEFAULT_SQLITE_PATH))
+    return SupabaseStorage(signed_in_clients(get_rest_clients(), get_token_cache()))
+
+
+def signed_in_clients(rest_clients, token_cache):
+    """client_for that sends each user's requests with that user's own access token"""
+    def client_for(user_id):
+        token = token_cache.access_token(user_id) if user_id is not None else None
+        if token is None:
+            raise UserNotSignedIn(user_id)
+        return rest_clients.for_token(token)
+    return client_for
+
+
+@st.cache_resource
+def get_service_storage():
+    """Backend for server-side jobs that act for every user, or None on Supabase without a service-role key"""
+    config = _storage_config()
+    if config.get("backend", "supabase") == "sqlite":
+        return get_storage()
+    client = get_service_rest()
+    return SupabaseStorage(lambda user_id: client) if client else None
@@ -0,0 +1,111 @@
+# streak_index.py
+import threading
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+
+EPOCH = date(1970, 1, 1)
+
+
+def _epoch_days(frame):
+    # UTC calendar day of each row, as days since 1970-01-01
+    return frame["timestamp"].values.astype("datetime64[D]").astype(np.int64)
+
+
+def _to_date(day):
+    return EPOCH + timedelta(days=int(day))
+
+
+class StreakIndex:
+    """Day-level activity for one user: streak runs, completed sessions per day, active days per ISO week"""
+
+    def __init__(self):
+        # Shared by every run that holds the snapshot, and updated in place by syncs
+        self._lock = threading.Lock()
+        self._sessions = {}    # day -> sessions logged that day
+        self._completed = {}   # day -> completed sessions that day
+        self._week_days = {}   # (iso year, iso week) -> active days in it
+        self._run_end = {}     # first day of a run of consecutive active days -> its last day
+        self._run_start = {}   # last day of a run -> its first day
+        self.longest_streak = 0
+        self._runs_stale = False
+
+    @classmethod
+    def from_frame(cls, frame):
+        index = cls()
+        index.apply(frame)
+        return index
+
+    def apply(self, added, removed=None):
+        """Fold in added rows and back out the old versions of updated ones, O(1) per row"""
+        with self._lock:
+            if added is not None and not added.empty:
+                for day, completed in zip(_epoch_days(added), added["status"] == "Completed"):
+                    self._count(int(day), bool(completed), 1)
+            # Removals go last so an updated row's day never drops to zero in between
+            if removed is not None and not removed.empty:
+                for day, completed in zip(_epoch_days(removed), removed["status"] == "Completed"):
+                    self._count(int(day), bool(completed), -1)
+            if self._runs_stale:
+                self._rebuild_runs()
+
+    def current_streak(self, today=None):
+        """Consecutive active days ending today, or yesterday if nothing is logged yet today"""
+        today = ((today or datetime.now(timezone.utc).date()) - EPOCH).days
+        with self._lock:
+            for end in (today, today - 1):
+                if end in self._run_start:
+                    return end - self._run_start[end] + 1
+        return 0
+
+    def consistency_score(self):
+        """Average active days per ISO week that had any activity"""
+        with self._lock:
+            if not self._week_days:
+                return 0
+            return round(len(self._sessions) / len(self._week_days), 2)
+
+    def completed_per_day(self):
+        """Completed sessions for each day that had any, oldest first"""
+        with self._lock:
+            days = sorted(self._completed)
+            counts = [self._completed[day] for day in days]
+        return pd.DataFrame({"date": [_to_date(day) for day in days], "count": counts})
+
+    def _count(self, day, completed, delta):
+        before = self._sessions.get(day, 0)
+        after = before + delta
+        if after > 0:
+            self._sessions[day] = after
+        else:
+            self._sessions.pop(day, None)
+        if completed:
+            remaining = self._completed.get(day, 0) + delta
+            if remaining > 0:
+                self._completed[day] = remaining
+            else:
+                self._completed.pop(day, None)
+
+        week = _to_date(day).isocalendar()[:2]
+        if before <= 0 < after:
+            self._week_days[week] = self._week_days.get(week, 0) + 1
+            self._extend_runs(day)
+        elif after <= 0 < before:
+            self._week_days[week] -= 1
+            if not self._week_days[week]:
+                del self._week_days[week]
+            # Splitting a run is rare (only when rows disappear); recompute instead
+            self._runs_stale = True
+
+    def _extend_runs(self, day):
+        start = self._run_start.pop(day - 1, day)
+        end = self._run_end.pop(day + 1, day)
+        self._run_end[start] = end
+        self._run_start[end] = start
+        self.longest_streak = max(self.longest_streak, end - start + 1)
+
+    def _rebuild_runs(self):
+        self._run_end, self._run_start, self.longest_streak = {}, {}, 0
+        for day in sorted(self._sessions):
+            self._extend_runs(day)
+        self._runs_stale = False
@@ -1,5 +1,89 @@
 # supabase_client.py
-from supabase import create_client
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from supabase import create_client, ClientOptions
 import streamlit as st
 
-supabase = create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])
+# Defaults for the shared HTTP transport; override under [http] in secrets
+DEFAULT_TIMEOUT_SECONDS = 10
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_SECONDS = 60
+
+
+def _http_config():
+    try:
+        return dict(st.secrets.get("http", {}))
+    except Exception:
+        return {}
+
+
+@st.cache_resource
+def get_http_client():
+    """One pooled HTTP/2 keep-alive transport for every script session in the process"""
+    config = _http_config()
+    return httpx.Client(
+        http2=True,
+        timeout=config.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=config.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+            max_keepalive_connections=config.get("max_keepalive_connections", DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+            keepalive_expiry=config.get("keepalive_seconds", DEFAULT_KEEPALIVE_SECONDS),
+        ),
+    )
+
+
+@st.cache_resource
+def get_supabase():
+    """Process-wide client for the auth API (sign in, sign up, token refresh), created on first use.
+
+    It is shared by every user, so it keeps no session of its own; data requests go through
+    RestClients instead, each carrying its own user's JWT.
+    """
+    timeout = _http_config().get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS)
+    options = ClientOptions(
+        postgrest_client_timeout=timeout,
+        storage_client_timeout=timeout,
+        httpx_client=get_http_client(),
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    return create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"], options=options)
+
+
+class RestClients:
+    """PostgREST clients over the shared transport, each sending one caller's JWT on every request"""
+
+    def __init__(self, url, api_key, http_client):
+        self._url = f"{url.rstrip('/')}/rest/v1"
+        self._headers = {**DEFAULT_POSTGREST_CLIENT_HEADERS, "apikey": api_key}
+        self._http_client = http_client
+
+    def for_token(self, access_token):
+        # Headers go with each request, not on the transport, so users never see each other's
+        return SyncPostgrestClient(self._url, headers=self._headers, http_client=self._http_client).auth(access_token)
+
+
+@st.cache_resource
+def get_rest_clients():
+    """Per-user PostgREST clients with the anon key; row-level security limits each to its user's rows"""
+    return RestClients(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"], get_http_client())
+
+
+def _service_role_key():
+    try:
+        return st.secrets.get("scheduler", {}).get("service_role_key")
+    except Exception:
+        return None
+
+
+@st.cache_resource
+def get_service_rest():
+    """Service-role PostgREST client for background jobs that act for every user, or None without
+    [scheduler] service_role_key. Row-level security doesn't apply to it, so callers filter by user.
+    """
+    key = _service_role_key()
+    if not key:
+        return None
+    return RestClients(st.secrets["SUPABASE_URL"], key, get_http_client()).for_token(key)
@@ -0,0 +1,48 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+from timer_state import TimerStateStore  # noqa: E402
+from write_queue import WriteQueue  # noqa: E402
+
+
+class RecordingSessionCache:
+    """Stands in for SessionCache: remembers which rows each flush invalidated"""
+
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, user_id, session_ids=()):
+        self.invalidated.append((user_id, list(session_ids)))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / "pomodash.sqlite3"))
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.sqlite3"))
+
+
+@pytest.fixture
+def timer_states():
+    return TimerStateStore()
+
+
+@pytest.fixture
+def make_queue(outbox, timer_states):
+    """WriteQueue over the given backend, with the worker left off so tests flush by hand"""
+    def make(storage):
+        return WriteQueue(RecordingSessionCache(), outbox, storage, timer_states, start=False)
+    return make
+
+
+@pytest.fixture
+def write_queue(make_queue, storage):
+    return make_queue(storage)
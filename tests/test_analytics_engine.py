@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+from analytics_engine import PreparedSessions, preprocess, summarize
+from test_streak_index import sessions
+
+NOW = datetime(2026, 1, 31, 12, 0, tzinfo=timezone.utc)
+
+
+def history():
+    return sessions(
+        (1, "2026-01-05T09:00:00Z", "Completed", 25, 5),     # Monday, ISO week 2
+        (2, "2026-01-05T10:00:00Z", "Early Stop", 10, 0),
+        (3, "2026-01-06T09:30:00Z", "Completed", 50, 10),    # Tuesday
+        (4, "2026-01-20T14:00:00Z", "Completed", 25, 5),     # Tuesday, ISO week 4
+        (5, "2026-01-30T09:00:00Z", "Work Completed", 40, 0),
+    )
+
+
+def test_preprocess_leaves_the_shared_frame_alone():
+    frame = history()
+    columns = list(frame.columns)
+
+    prepared = preprocess(frame)
+
+    assert list(frame.columns) == columns
+    assert prepared["total"].tolist() == [30, 10, 60, 30, 40]
+    assert prepared["efficiency"].round(1).tolist() == [83.3, 100.0, 83.3, 83.3, 100.0]
+
+
+def test_summary_kpis():
+    summary = summarize(preprocess(history()), now=NOW)
+
+    assert (summary.total_sessions, summary.total_minutes) == (5, 170)
+    assert (summary.completed_count, summary.completed_time) == (3, 120)
+    assert (summary.early_stop_count, summary.early_stop_time) == (1, 10)
+    assert (summary.total_work, summary.total_break) == (150, 20)
+    assert (summary.work_percent, summary.break_percent) == (88.2, 11.8)
+    assert (summary.most_active_day, summary.peak_week, summary.common_hour) == ("Monday", 2, 9)
+    assert summary.best_focus_day == "Friday"
+    assert summary.average_duration == 34.0
+    # Nothing logged today yet, so yesterday's session keeps the streak
+    assert (summary.current_streak, summary.longest_streak) == (1, 2)
+    # Two active days in week 2, one each in weeks 4 and 5
+    assert summary.consistency_score == 1.33
+    # 85 work minutes 16-30 days ago, 65 in the last 15
+    assert summary.progress_percent == -23.5
+
+
+def test_prepared_frames_are_reused_per_version():
+    prepared = PreparedSessions()
+    frame = history()
+
+    first = prepared.get("u1", frame, 1)
+    assert prepared.get("u1", frame, 1) is first
+
+    newer = prepared.get("u1", frame.iloc[:2], 2)
+    assert len(newer) == 2 and prepared.get("u1", frame.iloc[:2], 2) is newer
+
+
+def test_a_slow_run_with_an_older_version_does_not_replace_a_newer_frame():
+    prepared = PreparedSessions()
+    frame = history()
+    newer = prepared.get("u1", frame, 5)
+
+    stale = prepared.get("u1", frame.iloc[:1], 4)
+
+    assert len(stale) == 1
+    assert prepared.get("u1", frame, 5) is newer
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from daily_rollup import apply_session_delta, build_daily_rollup, empty_rollup
+from test_streak_index import replay, sessions
+
+
+def assert_matches_rebuild(syncs):
+    frame, deltas = replay(syncs)
+    rollup = empty_rollup()
+    for delta, replaced in deltas:
+        rollup = apply_session_delta(rollup, delta, replaced)
+    rebuilt = build_daily_rollup(frame)
+
+    pd.testing.assert_frame_equal(rollup, rebuilt, check_names=False)
+    return rollup
+
+
+def test_inserts_one_sync_at_a_time_match_a_rebuild():
+    syncs = [
+        sessions((1, "2026-01-05T09:00:00Z", "Completed", 25, 5)),
+        sessions((2, "2026-01-06T09:00:00Z", "Early Stop", 12, 0), (3, "2026-01-06T10:00:00Z", "Completed", 50, 10)),
+        # Out of order and with no work time, which the focus columns leave out
+        sessions((4, "2026-01-08T09:00:00Z", "Completed", 25, 5)),
+        sessions((5, "2026-01-04T09:00:00Z", "Early Stop", 0, 0)),
+    ]
+    rollup = assert_matches_rebuild(syncs)
+    assert rollup.loc[pd.Timestamp("2026-01-06").date(), ["work_minutes", "sessions", "hour_10"]].tolist() == [62, 2, 1]
+
+
+def test_an_open_row_completed_later_matches_a_rebuild():
+    syncs = [
+        sessions((1, "2026-02-02T09:00:00Z", "Work Completed", 25, 0),
+                 (2, "2026-02-03T09:00:00Z", "Work Completed", 25, 0)),
+        sessions((2, "2026-02-03T09:00:00Z", "Completed", 25, 5)),
+        sessions((1, "2026-02-02T09:00:00Z", "Completed", 25, 7), (3, "2026-02-03T11:00:00Z", "Work Completed", 25, 0)),
+    ]
+    rollup = assert_matches_rebuild(syncs)
+    assert rollup["work_only_sessions"].tolist() == [0, 1]
+    assert rollup["break_minutes"].tolist() == [7, 5]
+
+
+def test_days_split_at_utc_midnight_and_across_a_dst_change():
+    syncs = [
+        sessions((1, "2026-03-01T23:59:00Z", "Completed", 25, 5)),
+        sessions((2, "2026-03-02T00:01:00Z", "Completed", 25, 5)),
+        # Europe/Berlin moves to summer time at 2026-03-29T01:00Z; the rollup stays in UTC days and hours
+        sessions((3, "2026-03-29T01:30:00+01:00", "Completed", 25, 5)),   # 00:30Z
+        sessions((4, "2026-03-29T03:30:00+02:00", "Completed", 25, 5)),   # 01:30Z
+        sessions((5, "2026-03-30T01:30:00+02:00", "Completed", 25, 5)),   # 23:30Z on the 29th
+    ]
+    rollup = assert_matches_rebuild(syncs)
+    assert [str(day) for day in rollup.index] == ["2026-03-01", "2026-03-02", "2026-03-29"]
+    assert rollup.loc[rollup.index[-1], ["sessions", "hour_00", "hour_01", "hour_23"]].tolist() == [3, 1, 1, 1]
+
+
+def test_a_day_whose_only_row_moves_out_is_dropped():
+    rollup = build_daily_rollup(sessions(
+        (1, "2026-04-01T09:00:00Z", "Completed", 25, 5),
+        (2, "2026-04-02T09:00:00Z", "Completed", 25, 5),
+    ))
+    rollup = apply_session_delta(rollup, sessions(), sessions((2, "2026-04-02T09:00:00Z", "Completed", 25, 5)))
+
+    assert [str(day) for day in rollup.index] == ["2026-04-01"]
@@ -0,0 +1,63 @@
+import plotly.graph_objects as go
+
+from figure_cache import FigureCache, cached_figure
+
+
+def builder(builds):
+    def build(data=(1, 2, 3)):
+        builds.append(data)
+        return go.Figure(go.Bar(y=list(data)))
+    return build
+
+
+def test_a_figure_is_built_once_per_key():
+    cache, builds = FigureCache(), []
+    build = builder(builds)
+
+    first = cache.get_or_build(("u1", 1, "chart", ()), build)
+    again = cache.get_or_build(("u1", 1, "chart", ()), build)
+    cache.get_or_build(("u1", 2, "chart", ()), build)
+
+    assert again is first
+    assert len(builds) == 2
+
+
+def test_least_recently_used_figures_go_first():
+    cache, builds = FigureCache(max_entries=2), []
+    build = builder(builds)
+    cache.get_or_build("a", build)
+    cache.get_or_build("b", build)
+    cache.get_or_build("a", build)
+
+    cache.get_or_build("c", build)
+    cache.get_or_build("a", build)
+    cache.get_or_build("b", build)
+
+    # a and c stayed; b was evicted and had to be built again
+    assert len(builds) == 4
+
+
+def test_the_byte_budget_bounds_the_cache():
+    size = len(go.Figure(go.Bar(y=[1, 2, 3])).to_json())
+    cache, builds = FigureCache(max_bytes=size * 2), []
+    build = builder(builds)
+    for key in "abc":
+        cache.get_or_build(key, build)
+
+    cache.get_or_build("a", build)
+
+    assert len(builds) == 4
+
+
+def test_figures_follow_the_session_cache_version():
+    builds = []
+    build = builder(builds)
+
+    first = cached_figure("u-figures", 1, "chart", build, (1, 2, 3))
+    assert cached_figure("u-figures", 1, "chart", build, (1, 2, 3)) is first
+    cached_figure("u-figures", 2, "chart", build, (1, 2, 4))
+    # Data that didn't come from the cache is never reused
+    cached_figure("u-figures", None, "chart", build, (1, 2, 4))
+    cached_figure("u-figures", None, "chart", build, (1, 2, 4))
+
+    assert builds == [(1, 2, 3), (1, 2, 4), (1, 2, 4), (1, 2, 4)]
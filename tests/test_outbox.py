@@ -0,0 +1,32 @@
+from outbox import Outbox
+
+
+def test_pending_writes_survive_a_restart(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    Outbox(path).append("u1", "transition", "k1", {"action": "stop"})
+
+    reopened = Outbox(path)
+    assert [e["client_key"] for e in reopened.pending()] == ["k1"]
+    assert reopened.pending_count("u1") == 1
+
+
+def test_pending_keeps_record_order_and_skips_users(outbox):
+    outbox.append("u1", "transition", "a", {})
+    outbox.append("u2", "transition", "b", {})
+    outbox.append("u1", "transition", "c", {})
+
+    assert [e["client_key"] for e in outbox.pending()] == ["a", "b", "c"]
+    assert [e["client_key"] for e in outbox.pending(skip_users=["u1"])] == ["b"]
+    assert sorted(outbox.pending_users()) == ["u1", "u2"]
+
+
+def test_failures_are_counted_and_dead_letters_kept(outbox):
+    seq = outbox.append("u1", "transition", "a", {"action": "stop"})
+    assert outbox.record_failure(seq, "boom") == 1
+    assert outbox.record_failure(seq, "boom") == 2
+
+    outbox.dead_letter(seq)
+
+    assert outbox.pending() == []
+    [dead] = outbox.dead_letters("u1")
+    assert (dead["client_key"], dead["attempts"], dead["last_error"]) == ("a", 2, "boom")
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from session_cache import SessionCache
+
+USER = "user-1"
+
+
+class CountingStorage:
+    """Passes reads through to a real backend and records what each asked for"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.calls = []
+        self.fail_next = False
+
+    def fetch_sessions_page(self, user_id, columns, after_id=None, limit=1000):
+        if self.fail_next:
+            self.fail_next = False
+            raise ConnectionError("backend unreachable")
+        self.calls.append(("page", after_id))
+        return self.storage.fetch_sessions_page(user_id, columns, after_id, limit)
+
+    def fetch_sessions_by_id(self, user_id, columns, session_ids):
+        self.calls.append(("by_id", sorted(session_ids)))
+        return self.storage.fetch_sessions_by_id(user_id, columns, session_ids)
+
+
+def log(storage, key, timestamp, status="Completed", work_minutes=25, break_minutes=5):
+    result = storage.transition(USER, {"action": "log", "insert_session": {
+        "work_minutes": work_minutes, "break_minutes": break_minutes, "status": status,
+        "timestamp": timestamp, "client_key": key,
+    }})
+    return result["session_ids"][0]
+
+
+def complete(storage, key, break_minutes):
+    result = storage.transition(USER, {"action": "complete", "update_session": {
+        "client_key": key, "values": {"status": "Completed", "break_minutes": break_minutes},
+    }})
+    return result["session_ids"][0]
+
+
+def assert_matches_full_reload(cache, storage):
+    frame, _ = cache.get_versioned(USER)
+    reloaded = SessionCache(storage)
+    expected, _ = reloaded.get_versioned(USER)
+    pd.testing.assert_frame_equal(frame, expected)
+    pd.testing.assert_frame_equal(cache.get_rollup(USER)[0], reloaded.get_rollup(USER)[0])
+    streaks, rebuilt = cache.get_streaks(USER), reloaded.get_streaks(USER)
+    assert streaks.longest_streak == rebuilt.longest_streak
+    pd.testing.assert_frame_equal(streaks.completed_per_day(), rebuilt.completed_per_day())
+
+
+@pytest.fixture
+def backend(storage):
+    return CountingStorage(storage)
+
+
+def test_reads_within_the_ttl_reuse_the_snapshot(backend, storage):
+    log(storage, "a", "2026-01-05T09:00:00+00:00")
+    cache = SessionCache(backend)
+
+    frame, version = cache.get_versioned(USER)
+    calls = len(backend.calls)
+    again, same_version = cache.get_versioned(USER)
+
+    assert again is frame and same_version == version
+    assert len(backend.calls) == calls
+
+
+def test_new_rows_sync_as_a_delta_and_match_a_full_reload(backend, storage):
+    log(storage, "a", "2026-01-05T09:00:00+00:00")
+    first = log(storage, "b", "2026-01-05T23:59:00+00:00")
+    cache = SessionCache(backend)
+    _, version = cache.get_versioned(USER)
+
+    log(storage, "c", "2026-01-06T00:01:00+00:00")
+    backend.calls.clear()
+    cache.invalidate(USER)
+    frame, new_version = cache.get_versioned(USER)
+
+    assert new_version != version and len(frame) == 3
+    # Only rows after the newest one already held
+    assert backend.calls == [("page", first)]
+    assert_matches_full_reload(cache, storage)
+
+
+def test_updated_rows_are_refetched_by_id(backend, storage):
+    updated = log(storage, "a", "2026-01-05T09:00:00+00:00", status="Work Completed", break_minutes=0)
+    log(storage, "b", "2026-01-06T09:00:00+00:00")
+    cache = SessionCache(backend)
+    cache.get_versioned(USER)
+
+    complete(storage, "a", break_minutes=7)
+    cache.invalidate(USER, [updated])
+    frame, _ = cache.get_versioned(USER)
+
+    assert ("by_id", [updated]) in backend.calls
+    assert frame.loc[frame["id"] == updated, "break_minutes"].tolist() == [7]
+    assert_matches_full_reload(cache, storage)
+
+
+def test_recent_open_rows_are_refetched_without_being_named(backend, storage):
+    recent = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    open_row = log(storage, "a", recent, status="Work Completed", break_minutes=0)
+    cache = SessionCache(backend)
+    cache.get_versioned(USER)
+
+    # Completed elsewhere: nothing says which row changed
+    complete(storage, "a", break_minutes=5)
+    cache.invalidate(USER)
+    frame, _ = cache.get_versioned(USER)
+
+    assert frame.loc[frame["id"] == open_row, "status"].tolist() == ["Completed"]
+    assert_matches_full_reload(cache, storage)
+
+
+def test_a_failed_sync_still_refetches_its_rows_later(backend, storage):
+    updated = log(storage, "a", "2026-01-05T09:00:00+00:00", status="Work Completed", break_minutes=0)
+    cache = SessionCache(backend)
+    cache.get_versioned(USER)
+
+    complete(storage, "a", break_minutes=5)
+    cache.invalidate(USER, [updated])
+    backend.fail_next = True
+    with pytest.raises(ConnectionError):
+        cache.get_versioned(USER)
+    frame, _ = cache.get_versioned(USER)
+
+    assert frame["status"].tolist() == ["Completed"]
+
+
+def test_resync_reloads_the_whole_history(backend, storage):
+    log(storage, "a", "2026-01-05T09:00:00+00:00")
+    cache = SessionCache(backend)
+    _, version = cache.get_versioned(USER)
+
+    backend.calls.clear()
+    cache.resync(USER)
+    _, new_version = cache.get_versioned(USER)
+
+    assert backend.calls == [("page", None)]
+    assert new_version != version
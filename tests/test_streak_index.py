@@ -0,0 +1,108 @@
+from datetime import date
+
+import pandas as pd
+
+from session_cache import SESSION_COLUMNS, compact_sessions, empty_sessions
+from streak_index import StreakIndex
+
+
+def sessions(*rows):
+    """Compact session frame from (id, timestamp, status[, work_minutes, break_minutes]) tuples"""
+    records = [
+        {"id": row[0], "timestamp": row[1], "status": row[2],
+         "work_minutes": row[3] if len(row) > 3 else 25, "break_minutes": row[4] if len(row) > 4 else 0}
+        for row in rows
+    ]
+    return compact_sessions(pd.DataFrame(records, columns=SESSION_COLUMNS)) if records else empty_sessions()
+
+
+def replay(syncs):
+    """Fold each sync's rows in the way SessionCache does; returns the merged frame and the replaced rows per sync"""
+    frame = empty_sessions()
+    deltas = []
+    for delta in syncs:
+        replaced = frame[frame["id"].isin(delta["id"])]
+        deltas.append((delta, replaced))
+        merged = pd.concat([frame, delta], ignore_index=True).drop_duplicates("id", keep="last")
+        frame = compact_sessions(merged.sort_values("id", ignore_index=True))
+    return frame, deltas
+
+
+def assert_matches_rebuild(syncs, today):
+    frame, deltas = replay(syncs)
+    incremental = StreakIndex()
+    for delta, replaced in deltas:
+        incremental.apply(delta, replaced)
+    rebuilt = StreakIndex.from_frame(frame)
+
+    assert incremental.longest_streak == rebuilt.longest_streak
+    assert incremental.current_streak(today) == rebuilt.current_streak(today)
+    assert incremental.consistency_score() == rebuilt.consistency_score()
+    pd.testing.assert_frame_equal(incremental.completed_per_day(), rebuilt.completed_per_day())
+    return incremental
+
+
+def test_inserts_one_sync_at_a_time_match_a_rebuild():
+    syncs = [
+        sessions((1, "2026-01-05T09:00:00Z", "Completed")),
+        sessions((2, "2026-01-06T09:00:00Z", "Early Stop"), (3, "2026-01-06T10:00:00Z", "Completed")),
+        # Out of order: fills the gap between two runs and joins them
+        sessions((4, "2026-01-08T09:00:00Z", "Completed")),
+        sessions((5, "2026-01-07T09:00:00Z", "Completed")),
+    ]
+    index = assert_matches_rebuild(syncs, today=date(2026, 1, 8))
+    assert index.longest_streak == 4
+    assert index.current_streak(date(2026, 1, 8)) == 4
+
+
+def test_an_open_row_completed_later_matches_a_rebuild():
+    syncs = [
+        sessions((1, "2026-02-02T09:00:00Z", "Work Completed"), (2, "2026-02-03T09:00:00Z", "Work Completed")),
+        # Its break got filled in: same row, new status
+        sessions((2, "2026-02-03T09:00:00Z", "Completed", 25, 5)),
+        sessions((1, "2026-02-02T09:00:00Z", "Completed", 25, 5), (3, "2026-02-03T11:00:00Z", "Work Completed")),
+    ]
+    index = assert_matches_rebuild(syncs, today=date(2026, 2, 3))
+    assert index.completed_per_day()["count"].tolist() == [1, 1]
+    assert index.longest_streak == 2
+
+
+def test_days_split_at_utc_midnight():
+    syncs = [
+        sessions((1, "2026-03-01T23:59:00Z", "Completed")),
+        sessions((2, "2026-03-02T00:01:00Z", "Completed")),
+        # 2026-03-03 is empty, so this starts a new run
+        sessions((3, "2026-03-04T00:00:00Z", "Completed")),
+    ]
+    index = assert_matches_rebuild(syncs, today=date(2026, 3, 4))
+    assert index.longest_streak == 2
+    assert index.current_streak(date(2026, 3, 4)) == 1
+    # Nothing today yet: yesterday's run still counts
+    assert index.current_streak(date(2026, 3, 5)) == 1
+    assert index.current_streak(date(2026, 3, 6)) == 0
+
+
+def test_days_across_a_dst_change_are_utc_days():
+    # Europe/Berlin moves to summer time at 2026-03-29T01:00Z; local offsets must not shift a day
+    syncs = [
+        sessions((1, "2026-03-28T23:30:00+01:00", "Completed")),   # 22:30Z on the 28th
+        sessions((2, "2026-03-29T03:30:00+02:00", "Completed")),   # 01:30Z on the 29th
+        sessions((3, "2026-03-30T01:30:00+02:00", "Completed")),   # 23:30Z on the 29th
+        sessions((4, "2026-03-31T00:30:00+02:00", "Completed")),   # 22:30Z on the 30th
+    ]
+    index = assert_matches_rebuild(syncs, today=date(2026, 3, 30))
+    assert index.completed_per_day()["date"].tolist() == [date(2026, 3, 28), date(2026, 3, 29), date(2026, 3, 30)]
+    assert index.longest_streak == 3
+
+
+def test_a_removed_day_splits_its_run():
+    index = StreakIndex.from_frame(sessions(
+        (1, "2026-04-01T09:00:00Z", "Completed"),
+        (2, "2026-04-02T09:00:00Z", "Completed"),
+        (3, "2026-04-03T09:00:00Z", "Completed"),
+    ))
+    index.apply(empty_sessions(), sessions((2, "2026-04-02T09:00:00Z", "Completed")))
+
+    assert index.longest_streak == 1
+    assert index.current_streak(date(2026, 4, 3)) == 1
+    assert index.consistency_score() == 2.0
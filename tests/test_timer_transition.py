@@ -0,0 +1,238 @@
+import sqlite3
+import pytest
+
+USER = "user-1"
+
+
+def timer(phase="Work", **values):
+    return {"user_id": USER, "phase": phase, "start_time": "2026-01-01T10:00:00+00:00",
+            "duration_minutes": 25 if phase == "Work" else 5, "work_minutes": 25, "break_minutes": 5,
+            "status": "running", "elapsed_seconds": 0, "session_key": None, **values}
+
+
+def session(client_key, status="Work Completed", break_minutes=0):
+    return {"user_id": USER, "work_minutes": 25, "break_minutes": break_minutes, "status": status,
+            "timestamp": "2026-01-01T10:25:00+00:00", "client_key": client_key}
+
+
+def sessions(storage):
+    return storage.fetch_sessions_page(USER, ["id", "status", "break_minutes", "client_key"])
+
+
+def apply(storage, action, **transition):
+    return storage.transition(USER, {"action": action, **transition})
+
+
+@pytest.fixture
+def running(storage):
+    """A Work phase at version 1"""
+    assert apply(storage, "start", timer_op="upsert", timer=timer())["ok"]
+    return storage
+
+
+# ---------------------- SQLiteStorage.transition ----------------------
+def test_start_creates_the_timer(storage):
+    result = apply(storage, "start", timer_op="upsert", timer=timer())
+
+    assert result["ok"] and result["session_ids"] == [] and result["version"] == 1
+    assert storage.get_active_timer(USER)["phase"] == "Work"
+
+
+def test_pause_then_resume(running):
+    paused = apply(running, "pause", timer_op="update", expected_version=1,
+                   timer={"status": "paused", "elapsed_seconds": 90})
+    assert paused["ok"] and paused["timer"]["status"] == "paused" and paused["timer"]["phase"] == "Work"
+    assert paused["version"] == paused["timer"]["version"] == 2
+
+    resumed = apply(running, "resume", timer_op="upsert", expected_version=2, timer=timer())
+    assert resumed["ok"] and running.get_active_timer(USER)["status"] == "running"
+
+
+@pytest.mark.parametrize("action", ["work_done", "skip"])
+def test_work_done_and_skip_log_the_work_row_and_start_the_break(running, action):
+    result = apply(running, action, timer_op="upsert", expected_version=1,
+                   timer=timer("Break", session_key="k1"), insert_session=session("k1"))
+
+    assert result["ok"] and len(result["session_ids"]) == 1
+    assert running.get_active_timer(USER)["phase"] == "Break"
+    assert [row["status"] for row in sessions(running)] == ["Work Completed"]
+
+
+def test_break_done_completes_the_work_row_and_clears_the_timer(running):
+    apply(running, "work_done", timer_op="update", expected_version=1,
+          timer={"phase": "Break", "session_key": "k1"}, insert_session=session("k1"))
+
+    result = apply(running, "break_done", timer_op="delete", expected_version=2,
+                   update_session={"client_key": "k1", "values": {"break_minutes": 5, "status": "Completed"}})
+
+    assert result["ok"] and result["timer"] is None
+    assert running.get_active_timer(USER) is None
+    assert [(row["status"], row["break_minutes"]) for row in sessions(running)] == [("Completed", 5)]
+
+
+def test_stop_logs_the_session_and_clears_the_timer(running):
+    result = apply(running, "stop", timer_op="delete", insert_session=session("k1", status="Early Stop"))
+
+    assert result["ok"] and running.get_active_timer(USER) is None
+    assert [row["status"] for row in sessions(running)] == ["Early Stop"]
+
+
+def test_deleting_a_missing_timer_only_fails_on_a_stale_version(storage):
+    assert apply(storage, "stop", timer_op="delete")["ok"]
+    assert not apply(storage, "stop", timer_op="delete", expected_version=0)["ok"]
+    assert apply(storage, "stop", timer_op="delete", expected_version=1)["ok"]
+
+
+def test_the_database_assigns_versions(running):
+    result = apply(running, "pause", timer_op="update", expected_version=1, timer={"status": "paused", "version": 99})
+
+    assert result["version"] == 2 and running.get_active_timer(USER)["version"] == 2
+    assert running.get_timer_version(USER) == 2
+
+
+def test_versions_keep_counting_across_stop_and_start(running):
+    apply(running, "stop", timer_op="delete", expected_version=1)
+    restarted = apply(running, "start", timer_op="upsert", expected_version=2, timer=timer())
+
+    assert restarted["version"] == 3
+    # A tab that saw the first timer can't act on the new one
+    assert not apply(running, "pause", timer_op="update", expected_version=1, timer={"status": "paused"})["ok"]
+
+
+def test_updating_a_missing_timer_is_refused(storage):
+    result = apply(storage, "pause", timer_op="update", timer={"status": "paused"}, insert_session=session("k1"))
+
+    assert not result["ok"]
+    assert sessions(storage) == []
+
+
+@pytest.mark.parametrize("op", ["upsert", "update", "delete"])
+def test_a_stale_version_is_refused_and_writes_nothing(running, op):
+    result = apply(running, "work_done", timer_op=op, expected_version=7,
+                   timer=timer("Break"), insert_session=session("k1"))
+
+    assert not result["ok"] and result["version"] == 1
+    assert running.get_active_timer(USER)["version"] == 1
+    assert sessions(running) == []
+
+
+def test_a_session_row_is_only_inserted_once(running):
+    apply(running, "stop", timer_op="delete", insert_session=session("k1"))
+    apply(running, "stop", timer_op="delete", insert_session=session("k1"))
+
+    assert len(sessions(running)) == 1
+
+
+def test_a_replayed_key_returns_the_first_result(running):
+    transition = {"timer_op": "update", "expected_version": 1, "key": "t1",
+                  "timer": {"phase": "Break"}, "insert_session": session("k1")}
+    first = apply(running, "work_done", **transition)
+
+    # Its own version check would now fail, but it is the same transition
+    assert apply(running, "work_done", **transition) == first
+    assert len(sessions(running)) == 1
+
+
+def test_a_key_is_not_shared_between_users(running):
+    apply(running, "stop", timer_op="delete", key="t1")
+
+    assert not running.transition("someone-else", {"action": "stop", "timer_op": "delete", "key": "t1"})["ok"]
+
+
+# ---------------------- WriteQueue.transition ----------------------
+class Unreachable:
+    """Passes calls through to a real backend, except transitions while `down`"""
+
+    def __init__(self, storage):
+        self._storage = storage
+        self.down = True
+
+    def transition(self, user_id, transition):
+        if self.down:
+            raise sqlite3.OperationalError("database is locked")
+        return self._storage.transition(user_id, transition)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+def test_a_transition_returns_without_waiting_for_the_backend(make_queue, storage, timer_states):
+    backend = Unreachable(storage)
+    queue = make_queue(backend)
+
+    started = queue.transition(USER, "start", "upsert", timer(), expected_version=0)
+
+    assert started["ok"] and started["version"] == 1
+    assert timer_states.get(USER)[1]["version"] == 1
+    assert storage.get_active_timer(USER) is None
+
+
+def test_queued_transitions_land_at_the_versions_they_predicted(write_queue, storage, outbox):
+    started = write_queue.transition(USER, "start", "upsert", timer(), expected_version=0)
+    done = write_queue.transition(USER, "work_done", "upsert", timer("Break", session_key="k1"),
+                                  insert_session=session("k1"), expected_version=started["version"])
+    assert write_queue.pending_active_timer(USER)["data"]["phase"] == "Break"
+
+    write_queue._flush_outbox()
+
+    assert storage.get_timer_version(USER) == done["version"] == 2
+    assert storage.get_active_timer(USER)["phase"] == "Break"
+    assert [row["client_key"] for row in sessions(storage)] == ["k1"]
+    assert write_queue.pending_active_timer(USER) is None
+    assert outbox.pending_count() == 0
+
+
+def test_a_tab_behind_this_process_is_refused_locally(write_queue, outbox):
+    write_queue.transition(USER, "start", "upsert", timer(), expected_version=0)
+    assert write_queue.transition(USER, "pause", "update", {"status": "paused"}, expected_version=1)["ok"]
+
+    # A second tab still on version 1
+    assert not write_queue.transition(USER, "pause", "update", {"status": "paused"}, expected_version=1)["ok"]
+    assert outbox.pending_count() == 2
+
+
+def test_a_refused_transition_takes_the_ones_built_on_it_along(write_queue, storage, outbox, timer_states):
+    # Another server started a timer: the database is at version 1, this tab still thinks 0
+    apply(storage, "start", timer_op="upsert", timer=timer())
+    write_queue.transition(USER, "start", "upsert", timer(), expected_version=0)
+    # Would land by chance, as its expected version 1 is also the database's
+    write_queue.transition(USER, "stop", "delete", insert_session=session("k1"), expected_version=1)
+
+    write_queue._flush_outbox()
+
+    assert storage.get_active_timer(USER) is not None and sessions(storage) == []
+    assert write_queue.drain_failures(USER) == ["apply timer start: the timer was changed elsewhere",
+                                                "apply timer stop: the timer was changed elsewhere"]
+    assert [e["payload"]["action"] for e in outbox.dead_letters(USER)] == ["stop"]
+    assert timer_states.get(USER) is None and write_queue.pending_active_timer(USER) is None
+    assert outbox.pending_count() == 0
+
+
+def test_a_resend_after_a_lost_response_counts_as_success(write_queue, storage, outbox):
+    apply(storage, "start", timer_op="upsert", timer=timer())
+    write_queue.transition(USER, "work_done", "update", {"phase": "Break"}, insert_session=session("k1"),
+                           expected_version=1)
+    # The first delivery committed but its response never arrived
+    [entry] = outbox.pending()
+    storage.transition(USER, entry["payload"])
+
+    write_queue._flush_outbox()
+
+    assert write_queue.drain_failures(USER) == []
+    assert len(sessions(storage)) == 1
+
+
+def test_the_scheduler_applies_right_away(write_queue, storage, timer_states):
+    apply(storage, "start", timer_op="upsert", timer=timer())
+
+    result = write_queue.apply_transition(USER, {"action": "break_done", "timer_op": "delete", "expected_version": 1,
+                                                 "insert_session": session("k1")})
+
+    assert result["ok"] and result["version"] == 2
+    assert timer_states.get(USER)[1] is None
+    assert len(sessions(storage)) == 1
+
+
+def test_a_delete_without_a_version_is_never_queued(write_queue, outbox):
+    assert not write_queue.transition(USER, "stop", "delete", insert_session=session("k1"))["ok"]
+    assert outbox.pending_count() == 0
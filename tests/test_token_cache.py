@@ -0,0 +1,113 @@
+import base64
+import json
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from storage import SupabaseStorage, UserNotSignedIn, signed_in_clients
+from supabase_client import RestClients
+import token_cache as token_cache_module
+from token_cache import TokenCache
+
+
+def jwt(expires_in):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": int(time.time() + expires_in)}).encode()).decode()
+    return f"header.{payload.rstrip('=')}.signature"
+
+
+def signed_in(user_id, refresh_token, expires_in=3600):
+    user = SimpleNamespace(id=user_id)
+    session = SimpleNamespace(access_token=jwt(expires_in), refresh_token=refresh_token, expires_in=expires_in)
+    return user, session
+
+
+@pytest.fixture
+def token_cache():
+    return TokenCache(refresh_fn=None)
+
+
+def test_each_user_gets_their_own_access_token(token_cache):
+    alice, bob = signed_in("alice", "ra"), signed_in("bob", "rb")
+    token_cache.store(*alice)
+    token_cache.store(*bob)
+
+    assert token_cache.access_token("alice") == alice[1].access_token
+    assert token_cache.access_token("bob") == bob[1].access_token
+    assert token_cache.access_token("carol") is None
+
+
+def test_an_expiring_access_token_is_not_handed_out(token_cache):
+    token_cache.store(*signed_in("alice", "ra", expires_in=5))
+
+    assert token_cache.access_token("alice") is None
+
+
+def test_logging_out_drops_the_users_access_token(token_cache):
+    token_cache.store(*signed_in("alice", "ra"))
+    token_cache.forget("ra")
+
+    assert token_cache.access_token("alice") is None
+
+
+def test_requests_carry_the_jwt_of_the_user_they_are_for(token_cache):
+    requests = []
+    transport = httpx.MockTransport(lambda request: requests.append(request) or httpx.Response(200, json=[]))
+    rest = RestClients("https://example.supabase.co", "anon-key", httpx.Client(transport=transport))
+    storage = SupabaseStorage(signed_in_clients(rest, token_cache))
+    alice, bob = signed_in("alice", "ra"), signed_in("bob", "rb")
+    token_cache.store(*alice)
+    token_cache.store(*bob)
+
+    storage.get_active_timer("alice")
+    storage.get_active_timer("bob")
+
+    assert [r.headers["Authorization"] for r in requests] == [
+        f"Bearer {alice[1].access_token}", f"Bearer {bob[1].access_token}",
+    ]
+    assert {r.headers["apikey"] for r in requests} == {"anon-key"}
+
+
+def test_a_user_without_a_live_token_waits(token_cache):
+    storage = SupabaseStorage(signed_in_clients(RestClients("https://example.supabase.co", "anon-key", None),
+                                                token_cache))
+
+    with pytest.raises(UserNotSignedIn) as error:
+        storage.get_active_timer("alice")
+    assert storage.is_transient(error.value)
+
+
+class Refresher:
+    """Stands in for the auth API's refresh: rotates the refresh token on every call"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, refresh_token):
+        self.calls += 1
+        user, session = signed_in("alice", f"{refresh_token}-next")
+        return SimpleNamespace(user=user, session=session)
+
+
+def test_a_live_session_resolves_without_the_auth_api():
+    refresh = Refresher()
+    cache = TokenCache(refresh)
+    cache.store(*signed_in("alice", "r1"))
+
+    assert cache.resolve("r1")[1].refresh_token == "r1"
+    assert refresh.calls == 0
+
+
+def test_a_rotated_out_token_only_resolves_briefly(monkeypatch):
+    refresh = Refresher()
+    cache = TokenCache(refresh)
+    cache.store(*signed_in("alice", "r1", expires_in=60))
+
+    assert cache.resolve("r1")[1].refresh_token == "r1-next"
+    # Another tab racing on the same token gets the new session
+    assert cache.resolve("r1")[1].refresh_token == "r1-next"
+    assert refresh.calls == 1
+
+    later = time.time() + token_cache_module.ROTATED_TOKEN_GRACE_SECONDS + 1
+    monkeypatch.setattr(token_cache_module.time, "time", lambda: later)
+    cache.resolve("r1")
+    assert refresh.calls == 2
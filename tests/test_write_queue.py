@@ -0,0 +1,134 @@
+import sqlite3
+import httpx
+import pytest
+import write_queue as write_queue_module
+from storage import SupabaseStorage, signed_in_clients
+from supabase_client import RestClients
+from token_cache import TokenCache
+from test_token_cache import signed_in
+
+
+def session(client_key, minutes=25, status="Work Completed"):
+    return {"user_id": "ignored", "work_minutes": minutes, "break_minutes": 0, "status": status,
+            "timestamp": "2026-01-01T10:00:00+00:00", "client_key": client_key}
+
+
+def queue_session(outbox, user_id, client_key):
+    outbox.append(user_id, "transition", client_key, {"action": "stop", "insert_session": session(client_key)})
+
+
+def logged_keys(storage, user_id):
+    return [row["client_key"] for row in storage.fetch_sessions_page(user_id, ["id", "client_key"])]
+
+
+class FlakyStorage:
+    """Passes calls through to a real backend, except transitions for the users in `failing`"""
+
+    def __init__(self, storage, failing, error):
+        self._storage = storage
+        self.failing = set(failing)
+        self.error = error
+        self.calls = []
+
+    def transition(self, user_id, transition):
+        self.calls.append((user_id, transition["insert_session"]["client_key"]))
+        if user_id in self.failing:
+            raise self.error
+        return self._storage.transition(user_id, transition)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(write_queue_module, "RETRY_BACKOFF_SECONDS", 0)
+
+
+def test_flush_replays_queued_writes_in_order(write_queue, outbox, storage):
+    for key in ("a", "b", "c"):
+        queue_session(outbox, "u1", key)
+
+    write_queue._flush_outbox()
+
+    assert logged_keys(storage, "u1") == ["a", "b", "c"]
+    assert outbox.pending_count() == 0
+
+
+def test_resending_a_delivered_write_does_not_duplicate_it(write_queue, outbox, storage):
+    # Delivered once, but the acknowledgement was lost: the entry is still queued
+    storage.transition("u1", {"action": "stop", "insert_session": session("a")})
+    queue_session(outbox, "u1", "a")
+
+    write_queue._flush_outbox()
+
+    assert logged_keys(storage, "u1") == ["a"]
+    assert outbox.pending_count() == 0
+
+
+def test_one_users_failing_write_does_not_hold_up_others(make_queue, outbox, storage):
+    flaky = FlakyStorage(storage, failing={"u1"}, error=sqlite3.OperationalError("database is locked"))
+    queue = make_queue(flaky)
+    queue_session(outbox, "u1", "a1")
+    queue_session(outbox, "u2", "b1")
+    queue_session(outbox, "u1", "a2")
+
+    queue._flush_outbox()
+
+    assert logged_keys(storage, "u2") == ["b1"]
+    # u1's later write is not sent ahead of the one that failed
+    assert ("u1", "a2") not in flaky.calls
+    assert [e["client_key"] for e in outbox.pending()] == ["a1", "a2"]
+
+
+def test_transient_failures_are_retried_not_set_aside(make_queue, outbox, storage):
+    flaky = FlakyStorage(storage, failing={"u1"}, error=sqlite3.OperationalError("database is locked"))
+    queue = make_queue(flaky)
+    queue_session(outbox, "u1", "a1")
+
+    for _ in range(write_queue_module.DEAD_LETTER_AFTER_ATTEMPTS + 1):
+        queue._flush_outbox()
+    assert outbox.dead_letters() == []
+
+    flaky.failing.clear()
+    queue._flush_outbox()
+    assert logged_keys(storage, "u1") == ["a1"]
+
+
+def test_rejected_write_is_set_aside_and_reported(make_queue, outbox, storage):
+    flaky = FlakyStorage(storage, failing={"u1"}, error=sqlite3.IntegrityError("rejected"))
+    queue = make_queue(flaky)
+    queue_session(outbox, "u1", "a1")
+    queue_session(outbox, "u1", "a2")
+
+    for _ in range(write_queue_module.DEAD_LETTER_AFTER_ATTEMPTS):
+        queue._flush_outbox()
+
+    assert [e["client_key"] for e in outbox.dead_letters("u1")] == ["a1"]
+    assert queue.drain_failures("u1") == ["save timer stop: rejected"]
+
+    # The rest of the user's queue moves on once the bad write is out of the way
+    flaky.failing.clear()
+    queue._flush_outbox()
+    assert logged_keys(storage, "u1") == ["a2"]
+
+
+def test_writes_wait_for_their_user_to_sign_in_again(make_queue, outbox):
+    # A restart without a service-role key: nobody's token is known yet
+    result = {"ok": True, "action": "stop", "timer": None, "version": 1, "session_ids": [7]}
+    requests = []
+    transport = httpx.MockTransport(lambda request: requests.append(request) or httpx.Response(200, json=result))
+    tokens = TokenCache(refresh_fn=None)
+    rest = RestClients("https://example.supabase.co", "anon", httpx.Client(transport=transport))
+    queue = make_queue(SupabaseStorage(signed_in_clients(rest, tokens)))
+    queue_session(outbox, "u1", "a1")
+
+    for _ in range(write_queue_module.DEAD_LETTER_AFTER_ATTEMPTS + 1):
+        queue._flush_outbox()
+    assert outbox.dead_letters() == [] and requests == []
+
+    user, session = signed_in("u1", "r1")
+    tokens.store(user, session)
+    queue._flush_outbox()
+    assert outbox.pending_count() == 0
+    assert requests[0].headers["Authorization"] == f"Bearer {session.access_token}"
@@ -1,21 +1,37 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import time
 from datetime import datetime, timedelta, timezone
-from supabase_client import supabase
-from url_session_manager import get_current_user
+from storage import get_storage
+from write_queue import get_write_queue
+from active_timer import timer_durations, load_active_timer, parse_start_time, phase_deadline
+from timer_scheduler import get_timer_scheduler
+from page_data import take_prefetched, discard_prefetched
+from timer_state import get_timer_states
+from outbox import new_client_key
 
-def pomodoro_ui():
+# How often an open tab checks whether another tab, device or the scheduler moved its timer on
+FOLLOW_INTERVAL_SECONDS = 5
+
+
+def pomodoro_ui(user):
     st.title("⏳ Pomodoro Timer")
     st.markdown("Boost your productivity using the Pomodoro technique!")
 
-    # Ensure we have a valid user
-    current_user = get_current_user()
-    if not current_user:
+    if not user:
         st.error("❌ Authentication required. Please log in again.")
         return
 
+    # Surface any queued writes that failed in the background
+    write_queue = get_write_queue()
+    for message in write_queue.drain_failures(user.id):
+        st.error(f"❌ Failed to {message}")
+    unsynced = write_queue.unsynced_sessions(user.id)
+    if unsynced:
+        st.caption(f"🔄 {unsynced} session update(s) saved locally, waiting to sync.")
+
     # Check for background completed sessions BEFORE starting new timer
-    restore_timer_from_db()
+    restore_timer_from_db(user)
 
     with st.form(key="pomodoro_form"):
         col1, col2 = st.columns(2)
@@ -28,7 +44,6 @@ def pomodoro_ui():
     if submit and not st.session_state.get("running", False):
         # Clear any existing timer state first
         clear_timer_state()
-        delete_active_timer()
         
         st.session_state.work_duration = work_duration
         st.session_state.break_duration = break_duration
@@ -42,17 +57,16 @@ def pomodoro_ui():
         st.session_state.session_id = None
         st.session_state.work_logged = False  # Track if work has been logged
 
-        log_active_timer("Work", work_duration, break_duration, work_duration)
+        # Replaces any timer row left from before
+        commit_transition(user, "start", "upsert", timer_row(user, "Work", work_duration, break_duration, work_duration))
         st.rerun()
 
     if st.session_state.get("running", False):
-        run_timer()
+        run_timer(user)
 
 
-def run_timer():
-    # Ensure we have a valid user
-    current_user = get_current_user()
-    if not current_user:
+def run_timer(user):
+    if not user:
         st.error("❌ Authentication required. Please log in again.")
         st.session_state.running = False
         return
@@ -80,20 +94,24 @@ def run_timer():
     if col1.button("⏸ Pause"):
         st.session_state.paused = True
         st.session_state.elapsed += time.time() - st.session_state.start_time
-        update_active_timer_pause_state()
+        update_active_timer_pause_state(user)
 
     if col2.button("▶ Resume"):
         if st.session_state.paused:
             st.session_state.paused = False
             st.session_state.start_time = time.time()
-            log_active_timer(phase, duration, st.session_state.break_duration, st.session_state.original_work_duration)
+            commit_transition(user, "resume", "upsert",
+                              timer_row(user, phase, duration, st.session_state.break_duration,
+                                        st.session_state.original_work_duration,
+                                        elapsed_seconds=st.session_state.elapsed,
+                                        session_key=st.session_state.session_id))
 
     if col3.button("⏹ Stop"):
-        handle_timer_stop()
+        handle_timer_stop(user)
         return
 
     if phase == "Work" and col4.button("⏭ Skip to Break"):
-        handle_skip_to_break()
+        handle_skip_to_break(user)
         return
 
     if not st.session_state.paused:
@@ -101,301 +119,375 @@ def run_timer():
         remaining = int(total_time - elapsed)
 
         if remaining <= 0:
-            handle_timer_completion(elapsed)
+            handle_timer_completion(user, elapsed)
             return
 
-        mins, secs = divmod(remaining, 60)
-        timer_placeholder.markdown(f"### ⏱ Time Left: {mins:02d}:{secs:02d}")
-        
-        # Use a more stable rerun approach
-        time.sleep(0.1)
-        st.rerun()
+        with timer_placeholder.container():
+            render_countdown(remaining)
+        wait_for_phase_end(user, total_time)
     else:
         st.info("⏸ Timer is paused.")
+        wait_for_phase_end(user, total_time)
+
+
+def render_countdown(remaining_seconds):
+    """Tick the time-left display in the browser so the script doesn't rerun every second"""
+    components.html(f"""
+        <div id="countdown" style="font-family: 'Source Sans Pro', sans-serif; font-size: 1.75rem;
+             font-weight: 600; color: #fafafa;"></div>
+        <script>
+        const deadline = Date.now() + {remaining_seconds} * 1000;
+        const el = document.getElementById("countdown");
+        function tick() {{
+            const left = Math.max(0, Math.round((deadline - Date.now()) / 1000));
+            const mins = String(Math.floor(left / 60)).padStart(2, "0");
+            const secs = String(left % 60).padStart(2, "0");
+            el.textContent = `⏱ Time Left: ${{mins}}:${{secs}}`;
+            if (left > 0) setTimeout(tick, 250);
+        }}
+        tick();
+        </script>
+    """, height=50)
+
+
+def wait_for_phase_end(user, total_time):
+    """Rerun the app once the current phase is due, or as soon as another tab moves the timer on"""
+    remaining = total_time - (time.time() - st.session_state.start_time + st.session_state.elapsed)
+    if st.session_state.get("paused"):
+        remaining = FOLLOW_INTERVAL_SECONDS
+
+    # Only this tiny fragment runs on the timer; the full script reruns at the transition.
+    # Other tabs in this process show up in-process; writes through another server show up in
+    # a version read that this process's tabs share.
+    @st.fragment(run_every=max(1.0, min(remaining + 0.5, FOLLOW_INTERVAL_SECONDS)))
+    def phase_watcher():
+        if not st.session_state.get("running"):
+            return
+        if timer_moved_on(user):
+            st.rerun()
+        if st.session_state.get("paused"):
+            return
+        left = total_time - (time.time() - st.session_state.start_time + st.session_state.elapsed)
+        if left < 1:
+            st.rerun()
 
+    phase_watcher()
 
-def handle_timer_stop():
+
+def handle_timer_stop(user):
     """Handle manual timer stop"""
     phase = st.session_state.phase
     total_elapsed = st.session_state.elapsed + (time.time() - st.session_state.start_time)
     elapsed_minutes = max(1, round(total_elapsed / 60))  # Minimum 1 minute
 
+    insert_session = update_session = None
     if phase == "Work":
         # Log work session
-        session_id = log_work_session(elapsed_minutes)
-        st.session_state.session_id = session_id
-        st.session_state.work_logged = True
+        insert_session = session_row(user, elapsed_minutes)
+    elif st.session_state.session_id and not st.session_state.work_logged:
+        # Update existing session with break time
+        update_session = break_update(st.session_state.session_id, elapsed_minutes)
     else:
-        # Update existing session with break time or create new one
-        if st.session_state.session_id and not st.session_state.work_logged:
-            update_session_with_break(st.session_state.session_id, elapsed_minutes)
-        else:
-            log_complete_session(
-                work_minutes=st.session_state.get('original_work_duration', 0),
-                break_minutes=elapsed_minutes,
-                status="Early Stop"
-            )
-
-    cleanup_timer()
+        insert_session = session_row(
+            user,
+            work_minutes=st.session_state.get('original_work_duration', 0),
+            break_minutes=elapsed_minutes,
+            status="Early Stop"
+        )
+
+    commit_transition(user, "stop", "delete", insert_session=insert_session, update_session=update_session)
+    clear_timer_state()
     st.warning(f"⛔ Session stopped early. Logged {elapsed_minutes} min of {phase}.")
 
 
-def handle_skip_to_break():
+def handle_skip_to_break(user):
     """Handle skip to break functionality"""
     total_elapsed = st.session_state.elapsed + (time.time() - st.session_state.start_time)
     elapsed_minutes = max(1, round(total_elapsed / 60))
     
-    # Log work session
-    session_id = log_work_session(elapsed_minutes)
-    st.session_state.session_id = session_id
+    # Log work session and switch to break in one go
+    session = session_row(user, elapsed_minutes)
+    st.session_state.session_id = session["client_key"]
     st.session_state.work_logged = True
 
-    # Switch to break
     st.session_state.phase = "Break"
     st.session_state.start_time = time.time()
     st.session_state.start_timestamp = datetime.now(timezone.utc)
     st.session_state.elapsed = 0
     
-    log_active_timer("Break", st.session_state.break_duration, st.session_state.break_duration, st.session_state.original_work_duration)
+    commit_transition(user, "skip", "upsert",
+                      timer_row(user, "Break", st.session_state.break_duration, st.session_state.break_duration,
+                                st.session_state.original_work_duration, session_key=session["client_key"]),
+                      insert_session=session)
     st.info("⏭ Skipped to Break.")
     st.rerun()
 
 
-def handle_timer_completion(elapsed):
+def handle_timer_completion(user, elapsed):
     """Handle natural timer completion"""
     phase = st.session_state.phase
     elapsed_minutes = round(elapsed / 60)
 
     if phase == "Work":
-        # Log work session
-        session_id = log_work_session(elapsed_minutes)
-        st.session_state.session_id = session_id
+        # Log work session and switch to break in one go
+        session = session_row(user, elapsed_minutes)
+        st.session_state.session_id = session["client_key"]
         st.session_state.work_logged = True
         
         st.success(f"✅ {phase} session completed!")
         
-        # Switch to break
         st.session_state.phase = "Break"
         st.session_state.start_time = time.time()
         st.session_state.start_timestamp = datetime.now(timezone.utc)
         st.session_state.elapsed = 0
         
-        log_active_timer("Break", st.session_state.break_duration, st.session_state.break_duration, st.session_state.original_work_duration)
+        commit_transition(user, "work_done", "upsert",
+                          timer_row(user, "Break", st.session_state.break_duration, st.session_state.break_duration,
+                                    st.session_state.original_work_duration, session_key=session["client_key"]),
+                          insert_session=session)
         st.rerun()
     else:
         # Complete break session
         st.success(f"✅ {phase} session completed!")
         
         if st.session_state.session_id:
-            update_session_with_break(st.session_state.session_id, elapsed_minutes)
+            commit_transition(user, "break_done", "delete",
+                              update_session=break_update(st.session_state.session_id, elapsed_minutes))
         else:
-            log_complete_session(
+            commit_transition(user, "break_done", "delete", insert_session=session_row(
+                user,
                 work_minutes=st.session_state.get('original_work_duration', 25),
                 break_minutes=elapsed_minutes,
                 status="Completed"
-            )
+            ))
         
-        cleanup_timer()
+        clear_timer_state()
         st.balloons()
         st.success("🎉 Pomodoro Session Complete!")
 
 
-def log_work_session(work_minutes):
-    """Log work session immediately and return session ID for later update"""
+def session_row(user, work_minutes, break_minutes=0, status="Work Completed", timestamp=None):
+    """A new sessions row, keyed so a later transition can complete it"""
+    return {
+        "user_id": user.id,
+        "work_minutes": work_minutes,
+        "break_minutes": break_minutes,
+        "status": status,
+        "timestamp": (timestamp or datetime.now(timezone.utc)).isoformat(),
+        "client_key": new_client_key(),
+    }
+
+
+def break_update(session_key, break_minutes):
+    """Completes the work row created with session_key"""
+    return {"client_key": session_key, "values": {"break_minutes": break_minutes, "status": "Completed"}}
+
+
+def timer_row(user, phase, duration_minutes, break_minutes, work_minutes, elapsed_seconds=0, session_key=None):
+    """Full active_timer row for a running phase that started elapsed_seconds ago"""
+    return {
+        "user_id": user.id,
+        "phase": phase,
+        "start_time": (datetime.now(timezone.utc) - timedelta(seconds=elapsed_seconds)).isoformat(),
+        "duration_minutes": duration_minutes,
+        "work_minutes": work_minutes,
+        "break_minutes": break_minutes,
+        "status": "running",
+        "elapsed_seconds": 0,
+        "session_key": session_key,
+    }
+
+
+def commit_transition(user, action, timer_op=None, timer=None, insert_session=None, update_session=None):
+    """Queue a timer transition (its active_timer and sessions writes land in one call) and re-arm the scheduler.
+
+    The write only goes through if the timer is still the version this tab last saw. If another tab,
+    device or the scheduler already moved it on, this tab drops its own state and follows instead:
+    right away when this process knows, otherwise once the database has refused it.
+    """
     try:
-        current_user = get_current_user()
-        if not current_user:
-            st.error("❌ Authentication required to log session.")
-            return None
-            
-        response = supabase.table("sessions").insert({
-            "user_id": current_user.id,
-            "work_minutes": work_minutes,
-            "break_minutes": 0,
-            "status": "Work Completed",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }).execute()
-        
-        session_id = response.data[0]['id'] if response.data else None
-        st.toast(f"✅ Work session logged: {work_minutes} minutes")
-        return session_id
+        result = get_write_queue().transition(user.id, action, timer_op, timer, insert_session, update_session,
+                                              expected_version=st.session_state.get("timer_version"))
     except Exception as e:
-        st.error(f"❌ Failed to log work session: {e}")
-        return None
-
+        st.error(f"❌ Failed to save timer {action}: {e}")
+        return
 
-def update_session_with_break(session_id, break_minutes):
-    """Update existing session with break time"""
-    try:
-        supabase.table("sessions").update({
-            "break_minutes": break_minutes,
-            "status": "Completed"
-        }).eq("id", session_id).execute()
-        
-        st.toast(f"✅ Session completed with break: {break_minutes} minutes")
-    except Exception as e:
-        st.error(f"❌ Failed to update session with break: {e}")
+    if not result["ok"]:
+        clear_timer_state()
+        # Read the timer again rather than trusting anything this tab knew
+        st.session_state.pop("timer_state_version", None)
+        st.session_state.pop("timer_version", None)
+        st.rerun()
+    # Our own write: don't pick it up again as a change made elsewhere
+    st.session_state.timer_state_version = result["state_version"]
+    # The version the database gives the timer once the write lands; None if this tab had none
+    st.session_state.timer_version = result["version"]
+    if insert_session or update_session:
+        # The sessions prefetched at the start of this run no longer include this write
+        discard_prefetched("sessions")
+
+    if insert_session and insert_session["status"] == "Work Completed":
+        st.toast(f"✅ Work session logged: {insert_session['work_minutes']} minutes")
+    elif insert_session:
+        st.toast("✅ Session logged to database.")
+    if update_session:
+        st.toast(f"✅ Session completed with break: {update_session['values']['break_minutes']} minutes")
+
+    scheduler = get_timer_scheduler()
+    if scheduler:
+        state = get_timer_states().get(user.id)
+        row = state[1] if state else None
+        if row and row.get("status") == "running":
+            scheduler.schedule(user.id, phase_deadline(row))
+        else:
+            # Stopped, paused or done: nothing should complete it in the background
+            scheduler.cancel(user.id)
 
 
-def log_complete_session(work_minutes, break_minutes, status="Completed"):
-    """Log a complete session (fallback method)"""
-    try:
-        current_user = get_current_user()
-        if not current_user:
-            st.error("❌ Authentication required to log session.")
-            return
-            
-        supabase.table("sessions").insert({
-            "user_id": current_user.id,
-            "work_minutes": work_minutes,
-            "break_minutes": break_minutes,
-            "status": status,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }).execute()
-        st.toast("✅ Session logged to database.")
-    except Exception as e:
-        st.error(f"❌ Failed to log session: {e}")
+def update_active_timer_pause_state(user):
+    """Update the active timer when paused"""
+    elapsed_seconds = st.session_state.elapsed
+    new_start_time = datetime.now(timezone.utc) - timedelta(seconds=elapsed_seconds)
+    commit_transition(user, "pause", "update", {
+        "start_time": new_start_time.isoformat(),
+        "status": "paused",
+        "elapsed_seconds": int(elapsed_seconds),
+    })
+
+
+def read_active_timer(user_id):
+    """The user's active_timer row as it will be once queued writes land"""
+    return take_prefetched("active_timer", load_active_timer, get_write_queue(), get_storage(), user_id)
+
+
+def current_timer_row(user):
+    """The user's active timer if it changed since this browser session last looked, else None"""
+    states = get_timer_states()
+    seen = st.session_state.get("timer_state_version")
+    state = states.get(user.id) if seen is not None else None
+    if state is None:
+        # Session start, or this process lost track of the user: check the database once
+        state = states.reconcile(user.id, read_active_timer(user.id))
+    elif state[0] == seen:
+        return None
+    st.session_state.timer_state_version = state[0]
+    return state[1]
 
 
-def log_active_timer(phase, duration_minutes, break_duration=None, original_work_duration=None):
-    """Store active timer state in database"""
-    try:
-        current_user = get_current_user()
-        if not current_user:
-            st.error("❌ Authentication required to store timer.")
-            return
-        
-        timer_data = {
-            "user_id": current_user.id,
-            "phase": phase,
-            "start_time": datetime.now(timezone.utc).isoformat(),
-            "duration_minutes": duration_minutes,
-            "status": "running"
-        }
-        
-        # Encode break_duration and original_work_duration
-        if break_duration is not None and original_work_duration is not None:
-            encoded_value = break_duration * 1000 + original_work_duration
-            timer_data["break_duration"] = encoded_value
-        
-        supabase.table("active_timer").upsert(timer_data).execute()
-    except Exception as e:
-        st.error(f"❌ Failed to store timer: {e}")
+def timer_moved_on(user):
+    """Whether another tab, device or the scheduler changed the timer since this tab last wrote or read it"""
+    state = get_timer_states().get(user.id)
+    if state is None or state[0] != st.session_state.get("timer_state_version"):
+        return True
+    return changed_elsewhere(user)
 
 
-def update_active_timer_pause_state():
-    """Update the active timer when paused"""
+def changed_elsewhere(user):
+    """Whether the database has a newer timer version than this tab knows, e.g. written through another server"""
+    known = st.session_state.get("timer_version")
+    if known is None:
+        return False
     try:
-        current_user = get_current_user()
-        if not current_user:
-            return
-        
-        current_time = datetime.now(timezone.utc)
-        elapsed_seconds = st.session_state.elapsed
-        new_start_time = current_time - timedelta(seconds=elapsed_seconds)
-        
-        supabase.table("active_timer").update({
-            "start_time": new_start_time.isoformat()
-        }).eq("user_id", current_user.id).execute()
-    except Exception as e:
-        st.error(f"❌ Failed to update timer state: {e}")
+        return latest_timer_version(user.id) > known
+    except Exception:
+        # Can't tell right now; the next check will
+        return False
 
 
-def decode_break_duration(encoded_value):
-    """Decode the break_duration and original_work_duration"""
-    if encoded_value is None:
-        return 5, 25
-    
-    break_dur = encoded_value // 1000
-    work_dur = encoded_value % 1000
-    
-    # Sanity checks
-    if break_dur <= 0 or break_dur > 60:
-        break_dur = 5
-    if work_dur <= 0 or work_dur > 120:
-        work_dur = 25
-        
-    return break_dur, work_dur
+@st.cache_data(ttl=FOLLOW_INTERVAL_SECONDS, show_spinner=False)
+def latest_timer_version(user_id):
+    """The user's timer version in the database, read at most once per interval for all tabs in this process"""
+    return get_storage().get_timer_version(user_id)
 
 
-def restore_timer_from_db():
+def restore_timer_from_db(user):
     """Restore timer state from database and handle background completions"""
     try:
-        current_user = get_current_user()
-        if not current_user or st.session_state.get("running", False):
-            return
-            
-        res = supabase.table("active_timer").select("*").eq("user_id", current_user.id).limit(1).execute()
-        data = res.data[0] if res.data else None
-
+        if st.session_state.get("running", False):
+            if not timer_moved_on(user):
+                return
+            # Someone else drives the timer now; show their state rather than ours
+            clear_timer_state()
+            # Only polled while a timer runs or is paused; an idle tab finds out when its next start is refused
+            if changed_elsewhere(user):
+                # Written through another server, so this process's view is stale too: read it again
+                st.session_state.pop("timer_state_version", None)
+                st.session_state.timer_version = latest_timer_version(user.id)
+
+        data = current_timer_row(user)
         if not data:
+            if st.session_state.get("timer_version") is None:
+                # Once per browser session, so even this tab's first start and stop are versioned
+                st.session_state.timer_version = latest_timer_version(user.id)
             return
+        # Transitions from here on only apply if nobody moved the timer on in the meantime
+        st.session_state.timer_version = data.get("version")
 
-        start_time = datetime.fromisoformat(data["start_time"].replace("Z", "+00:00"))
+        start_time = parse_start_time(data)
         now = datetime.now(timezone.utc)
         duration = data["duration_minutes"]
         phase = data["phase"]
         elapsed_seconds = (now - start_time).total_seconds()
         remaining_seconds = duration * 60 - elapsed_seconds
-        
-        # Decode break duration and original work duration
-        stored_break_duration, original_work_duration = decode_break_duration(data.get("break_duration"))
+        stored_break_duration, original_work_duration = timer_durations(data)
+
+        if data.get("status") == "paused":
+            # Paused timers don't run down; pick up where it was left
+            st.session_state.work_duration = duration if phase == "Work" else original_work_duration
+            st.session_state.break_duration = stored_break_duration
+            st.session_state.original_work_duration = original_work_duration
+            st.session_state.phase = phase
+            st.session_state.start_time = time.time()
+            st.session_state.elapsed = data.get("elapsed_seconds") or 0
+            st.session_state.running = True
+            st.session_state.paused = True
+            st.session_state.session_id = data.get("session_key")
+            st.session_state.work_logged = False
 
-        if remaining_seconds <= 0:
+            st.toast(f"🔁 Restored paused {phase} session!")
+        elif remaining_seconds <= 0:
             # Timer completed in background
             if phase == "Work":
-                # Log work session that completed in background
-                session_id = log_work_session(duration)
-                
                 # Check if enough time has passed to auto-complete break too
-                break_completion_time = start_time + timedelta(minutes=duration + stored_break_duration)
+                break_start_time = start_time + timedelta(minutes=duration)
+                break_completion_time = break_start_time + timedelta(minutes=stored_break_duration)
                 
                 if now >= break_completion_time:
-                    # Both work and break completed in background
-                    if session_id:
-                        update_session_with_break(session_id, stored_break_duration)
-                    else:
-                        log_complete_session(duration, stored_break_duration, "Completed")
-                    
-                    cleanup_timer()
+                    # Both work and break completed in background: one completed row, timer gone
+                    commit_transition(user, "break_done", "delete",
+                                      insert_session=session_row(user, duration, stored_break_duration, "Completed"))
+                    clear_timer_state()
                     st.success("🎉 Pomodoro session auto-completed while away!")
                 else:
-                    # Start break session
+                    # Log the work session and start the break in one transition
                     remaining_break = (break_completion_time - now).total_seconds()
-                    if remaining_break > 0:
-                        st.session_state.session_id = session_id
-                        st.session_state.work_logged = True
-                        st.session_state.phase = "Break"
-                        st.session_state.work_duration = original_work_duration
-                        st.session_state.break_duration = stored_break_duration
-                        st.session_state.original_work_duration = original_work_duration
-                        st.session_state.start_time = time.time() - (stored_break_duration * 60 - remaining_break)
-                        st.session_state.elapsed = 0
-                        st.session_state.running = True
-                        st.session_state.paused = False
-                        
-                        # Update active timer for break phase
-                        break_start_time = start_time + timedelta(minutes=duration)
-                        supabase.table("active_timer").update({
-                            "phase": "Break",
-                            "start_time": break_start_time.isoformat(),
-                            "duration_minutes": stored_break_duration
-                        }).eq("user_id", current_user.id).execute()
-                        
-                        st.success("✅ Work completed! Break session in progress.")
-                    else:
-                        # Break also completed
-                        if session_id:
-                            update_session_with_break(session_id, stored_break_duration)
-                        cleanup_timer()
-                        st.success("🎉 Full Pomodoro session completed while away!")
+                    session = session_row(user, duration)
+                    st.session_state.session_id = session["client_key"]
+                    st.session_state.work_logged = True
+                    st.session_state.phase = "Break"
+                    st.session_state.work_duration = original_work_duration
+                    st.session_state.break_duration = stored_break_duration
+                    st.session_state.original_work_duration = original_work_duration
+                    st.session_state.start_time = time.time() - (stored_break_duration * 60 - remaining_break)
+                    st.session_state.elapsed = 0
+                    st.session_state.running = True
+                    st.session_state.paused = False
+                    
+                    commit_transition(user, "work_done", "upsert",
+                                      timer_row(user, "Break", stored_break_duration, stored_break_duration,
+                                                original_work_duration,
+                                                elapsed_seconds=(now - break_start_time).total_seconds(),
+                                                session_key=session["client_key"]),
+                                      insert_session=session)
+                    st.success("✅ Work completed! Break session in progress.")
             else:
-                # Break session completed in background
-                # Try to find the corresponding work session
-                work_duration = original_work_duration
-                
-                log_complete_session(work_duration, duration, "Completed")
-                cleanup_timer()
+                # Break session completed in background; complete the work row it belongs to
+                if data.get("session_key"):
+                    commit_transition(user, "break_done", "delete", update_session=break_update(data["session_key"], duration))
+                else:
+                    commit_transition(user, "break_done", "delete",
+                                      insert_session=session_row(user, original_work_duration, duration, "Completed"))
+                clear_timer_state()
                 st.success("🎉 Break session auto-completed!")
         else:
             # Timer still running - restore state
@@ -407,30 +499,17 @@ def restore_timer_from_db():
             st.session_state.elapsed = 0
             st.session_state.running = True
             st.session_state.paused = False
-            st.session_state.session_id = None
+            st.session_state.session_id = data.get("session_key")
             st.session_state.work_logged = False
             
             st.toast(f"🔁 Restored {phase} session!")
             
     except Exception as e:
         st.error(f"❌ Timer restore error: {e}")
-        cleanup_timer()
-
-
-def cleanup_timer():
-    """Clean up timer state and database"""
-    delete_active_timer()
-    clear_timer_state()
-
-
-def delete_active_timer():
-    """Delete active timer from database"""
-    try:
-        current_user = get_current_user()
-        if current_user:
-            supabase.table("active_timer").delete().eq("user_id", current_user.id).execute()
-    except:
-        pass
+        # Usually a failed read: forget what this tab shows, but leave the timer itself alone,
+        # as it may be running on another device
+        clear_timer_state()
+        st.session_state.pop("timer_state_version", None)
 
 
 def clear_timer_state():
@@ -440,6 +519,7 @@ def clear_timer_state():
         "elapsed", "running", "paused", "start_timestamp",
         "original_work_duration", "session_id", "work_logged"
     ]
+    # timer_version stays, so the next start only applies if nobody else started a timer meanwhile
     
     for key in keys_to_clear:
         st.session_state.pop(key, None)
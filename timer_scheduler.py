@@ -0,0 +1,173 @@
+# timer_scheduler.py
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import streamlit as st
+from storage import get_service_storage
+from write_queue import get_write_queue
+from active_timer import timer_durations, phase_deadline
+from outbox import new_client_key
+
+logger = logging.getLogger(__name__)
+
+# An open tab gets this long to run the transition itself before the scheduler steps in
+GRACE_SECONDS = 5
+
+# How often to pick up timers started by other processes
+RELOAD_INTERVAL_SECONDS = 300
+
+
+class TimerScheduler:
+    """Background thread that completes due active_timer phases for every user.
+
+    storage must be able to read and write any user's timer (see get_service_storage); the
+    process-wide write queue only keeps this process's timer state and session cache in step.
+    """
+
+    def __init__(self, storage, write_queue):
+        self._storage = storage
+        self._write_queue = write_queue
+        self._heap = []
+        self._deadlines = {}
+        self._cond = threading.Condition()
+        self._next_reload = 0
+        self._thread = threading.Thread(target=self._run, name="timer-scheduler", daemon=True)
+        self._thread.start()
+
+    def schedule(self, user_id, deadline):
+        """(Re)arm a user's timer; only the latest deadline per user is honoured"""
+        due = deadline.timestamp()
+        with self._cond:
+            self._deadlines[user_id] = due
+            heapq.heappush(self._heap, (due, user_id))
+            self._cond.notify()
+
+    def cancel(self, user_id):
+        """Forget a user's timer, e.g. after it was stopped or paused"""
+        with self._cond:
+            self._deadlines.pop(user_id, None)
+
+    def _run(self):
+        while True:
+            if time.time() >= self._next_reload:
+                self._next_reload = time.time() + RELOAD_INTERVAL_SECONDS
+                try:
+                    self._load_running_timers()
+                except Exception:
+                    logger.exception("Failed to load running timers")
+
+            user_id = self._wait_for_due()
+            if user_id is None:
+                continue
+            try:
+                self._fire(user_id)
+            except Exception:
+                logger.exception("Scheduled transition failed for user %s", user_id)
+
+    def _wait_for_due(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                # Drop heap entries superseded by a later schedule() or cancel()
+                while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+                wake_at = self._next_reload
+                if self._heap:
+                    due, user_id = self._heap[0]
+                    if due + GRACE_SECONDS <= now:
+                        heapq.heappop(self._heap)
+                        del self._deadlines[user_id]
+                        return user_id
+                    wake_at = min(wake_at, due + GRACE_SECONDS)
+                if now >= self._next_reload:
+                    return None
+                self._cond.wait(timeout=wake_at - now)
+
+    def _load_running_timers(self):
+        for row in self._storage.list_active_timers("running"):
+            self.schedule(row["user_id"], phase_deadline(row))
+
+    def _fire(self, user_id):
+        row = self._storage.get_active_timer(user_id)
+        if not row or row.get("status") != "running":
+            return
+
+        deadline = phase_deadline(row)
+        if deadline > datetime.now(timezone.utc):
+            # Someone restarted or extended the phase; wait for the new deadline
+            self.schedule(user_id, deadline)
+            return
+
+        break_minutes, original_work_minutes = timer_durations(row)
+        if row["phase"] == "Work":
+            self._finish_work(user_id, row, deadline, break_minutes)
+        else:
+            self._finish_break(user_id, row, deadline, original_work_minutes)
+
+    def _finish_work(self, user_id, row, work_end, break_minutes):
+        # One transaction, and only if the row is still the version we saw; a tab may have won the race
+        # The work row's key goes into the timer row, so whoever ends the break can complete it
+        session_key = new_client_key()
+        result = self._write_queue.apply_transition(user_id, {
+            "action": "work_done",
+            "timer_op": "update",
+            "timer": {
+                "phase": "Break",
+                "start_time": work_end.isoformat(),
+                "duration_minutes": break_minutes,
+                "session_key": session_key,
+            },
+            "insert_session": {
+                "user_id": user_id,
+                "work_minutes": row["duration_minutes"],
+                "break_minutes": 0,
+                "status": "Work Completed",
+                "timestamp": work_end.isoformat(),
+                "client_key": session_key,
+            },
+            "expected_version": row.get("version") or 0,
+        }, storage=self._storage)
+        if result["ok"]:
+            self.schedule(user_id, work_end + timedelta(minutes=break_minutes))
+
+    def _finish_break(self, user_id, row, break_end, original_work_minutes):
+        transition = {"action": "break_done", "timer_op": "delete", "expected_version": row.get("version") or 0}
+        session_key = row.get("session_key")
+        if session_key:
+            transition["update_session"] = {
+                "client_key": session_key,
+                "values": {"break_minutes": row["duration_minutes"], "status": "Completed"},
+            }
+        else:
+            transition["insert_session"] = {
+                "user_id": user_id,
+                "work_minutes": original_work_minutes,
+                "break_minutes": row["duration_minutes"],
+                "status": "Completed",
+                "timestamp": break_end.isoformat(),
+                "client_key": new_client_key(),
+            }
+        self._write_queue.apply_transition(user_id, transition, storage=self._storage)
+
+
+def scheduler_enabled():
+    """Whether this process should run the background timer scheduler"""
+    try:
+        return bool(st.secrets.get("scheduler", {}).get("enabled", True))
+    except Exception:
+        return True
+
+
+@st.cache_resource
+def get_timer_scheduler():
+    """Process-wide scheduler, or None when disabled or without a service-role key under [scheduler] in secrets"""
+    if not scheduler_enabled():
+        return None
+    storage = get_service_storage()
+    if storage is None:
+        # The user-facing client only acts as whoever signed in, so RLS would refuse everyone else's timers
+        logger.warning("Timer scheduler disabled: set [scheduler] service_role_key to let it complete timers")
+        return None
+    return TimerScheduler(storage, get_write_queue())
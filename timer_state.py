@@ -0,0 +1,73 @@
+# timer_state.py
+import itertools
+import threading
+import streamlit as st
+
+
+class TimerStateStore:
+    """In-process active_timer state per user, versioned so runs can tell when it changed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user_id -> (version, row or None); versions never repeat, even after a user is forgotten
+        self._states = {}
+        self._versions = itertools.count(1)
+
+    def get(self, user_id):
+        """(version, row) for a user, or None if this process hasn't seen them yet"""
+        with self._lock:
+            state = self._states.get(user_id)
+        if state is None:
+            return None
+        return state[0], dict(state[1]) if state[1] else None
+
+    def reconcile(self, user_id, row):
+        """Adopt the database's view on session start; bumps the version only if it differs"""
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None or state[1] != (row or None):
+                state = self._states[user_id] = (next(self._versions), dict(row) if row else None)
+            return state[0], dict(state[1]) if state[1] else None
+
+    def apply(self, user_id, kind, data=None, expected_version=None):
+        """Record a local write: 'upsert' replaces the row, 'update' merges into it, 'delete' clears it.
+
+        With expected_version the write is refused if the row this process knows carries another
+        database version. Only the database can say for sure (the version also moves when the row
+        is deleted), so this just spares a tab that is clearly behind. Returns the new state version, 0 if the user's state is now
+        unknown, or None if the write was refused.
+        """
+        with self._lock:
+            state = self._states.get(user_id)
+            row = state[1] if state else None
+            if self._stale(row, expected_version):
+                return None
+            if kind == "upsert":
+                row = dict(data)
+            elif kind == "update" and not row:
+                # A partial write to a row we never saw; forget the user so the next read reconciles
+                self._states.pop(user_id, None)
+                return 0
+            elif kind == "update":
+                row = {**row, **data}
+            else:
+                row = None
+            version = next(self._versions)
+            self._states[user_id] = (version, row)
+            return version
+
+    @staticmethod
+    def _stale(row, expected_version):
+        known = (row or {}).get("version")
+        return expected_version is not None and known is not None and known != expected_version
+
+    def forget(self, user_id):
+        """Drop a user's state so the next read reconciles with the database"""
+        with self._lock:
+            self._states.pop(user_id, None)
+
+
+@st.cache_resource
+def get_timer_states():
+    """Process-wide timer state shared by every script session and the scheduler"""
+    return TimerStateStore()
@@ -0,0 +1,138 @@
+# token_cache.py
+import base64
+import hashlib
+import json
+import threading
+import time
+import streamlit as st
+from supabase_client import get_supabase
+
+# Refresh this long before the access token actually expires
+REFRESH_MARGIN_SECONDS = 300
+
+# A tab that refreshed a token just before another tab of the same browser session did gets
+# the new session for this long; after that the rotated-out token has to go to the auth API
+ROTATED_TOKEN_GRACE_SECONDS = 10
+
+# Don't send an access token this close to its expiry; the request could arrive after it
+SEND_MARGIN_SECONDS = 30
+
+
+def jwt_expiry(access_token):
+    """Expiry (epoch seconds) from a JWT payload; the signature is the auth server's concern"""
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+
+def _token_key(refresh_token):
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def _expires_at(session):
+    return jwt_expiry(session.access_token) or getattr(session, "expires_at", None) or 0
+
+
+class _PendingRefresh:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = (None, None)
+        self.error = None
+
+
+class TokenCache:
+    """Process-wide map of refresh token -> live auth session, refreshed only near expiry"""
+
+    def __init__(self, refresh_fn):
+        self._refresh_fn = refresh_fn
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pending = {}
+        # rotated-out refresh token -> (entry, until), for tabs racing on the same refresh
+        self._rotated = {}
+        # user_id -> (access token, expiry) of the user's newest session, for their data requests
+        self._access = {}
+
+    def resolve(self, refresh_token, auth_context=None):
+        """Return (user, session) for a refresh token, hitting the auth API only when needed"""
+        key = _token_key(refresh_token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[2] - REFRESH_MARGIN_SECONDS > now:
+                return entry[0], entry[1]
+            rotated = self._rotated.get(key)
+            if rotated and rotated[1] > now:
+                return rotated[0][0], rotated[0][1]
+            # Collapse concurrent refreshes of the same token into one call
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _PendingRefresh()
+
+        if not leader:
+            pending.done.wait()
+            if pending.error:
+                raise pending.error
+            return pending.result
+
+        try:
+            if auth_context:
+                auth_context.count_network_call()
+            result = self._refresh_fn(refresh_token)
+            if result.session and result.user:
+                pending.result = (result.user, result.session)
+                self.store(result.user, result.session, previous_refresh_token=refresh_token)
+            return pending.result
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def store(self, user, session, previous_refresh_token=None):
+        """Remember a fresh session under its refresh token (and, briefly, the one it replaced)"""
+        entry = (user, session, _expires_at(session))
+        now = time.time()
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if v[2] > now}
+            self._rotated = {k: v for k, v in self._rotated.items() if v[1] > now}
+            self._entries[_token_key(session.refresh_token)] = entry
+            current = self._access.get(str(user.id))
+            if current is None or current[1] <= entry[2]:
+                self._access[str(user.id)] = (session.access_token, entry[2])
+            # Only a few seconds: a leaked or revoked token mustn't keep resolving without the auth server
+            if previous_refresh_token:
+                self._entries.pop(_token_key(previous_refresh_token), None)
+                self._rotated[_token_key(previous_refresh_token)] = (entry, now + ROTATED_TOKEN_GRACE_SECONDS)
+
+    def forget(self, refresh_token):
+        """Drop a cached session, e.g. on logout"""
+        with self._lock:
+            dropped = {v[1].access_token for v in self._entries.values() if v[1].refresh_token == refresh_token}
+            self._entries = {k: v for k, v in self._entries.items() if v[1].refresh_token != refresh_token}
+            self._rotated = {k: v for k, v in self._rotated.items() if v[0][1].refresh_token != refresh_token}
+            self._access = {k: v for k, v in self._access.items() if v[0] not in dropped}
+
+    def access_token(self, user_id):
+        """A live access token for the user's own data requests, or None if this process has none.
+
+        Never refreshes: rotating a refresh token here would strand the tab holding it. The user's
+        next run refreshes it near expiry instead.
+        """
+        with self._lock:
+            entry = self._access.get(str(user_id))
+        if entry and entry[1] - SEND_MARGIN_SECONDS > time.time():
+            return entry[0]
+        return None
+
+
+@st.cache_resource
+def get_token_cache():
+    """Shared token cache for every script session in this process"""
+    return TokenCache(get_supabase().auth.refresh_session)
@@ -2,8 +2,10 @@
 import streamlit as st
 import json
 import base64
-from datetime import datetime, timezone, timedelta
-from supabase_client import supabase
+from datetime import datetime, timezone
+from token_cache import get_token_cache
+from page_data import take_prefetched
+from auth_context import current_auth_context
 
 def encode_session_data(data):
     """Encode session data for URL storage"""
@@ -38,11 +40,19 @@ def save_session_to_url(user, session):
         st.query_params.update({"session": encoded_data})
         
         # Also store in session state for current session
-        st.session_state.user = user
-        st.session_state.access_token = session.access_token
-        st.session_state.refresh_token = session.refresh_token
-        st.session_state.token_created_at = datetime.now(timezone.utc)
-        st.session_state.expires_in = session.expires_in
+        store_session_state(user, session)
+
+        # New tabs opened from this URL can reuse the session without a refresh
+        get_token_cache().store(user, session)
+
+def store_session_state(user, session):
+    """Keep the authenticated user and tokens for the current browser session"""
+    st.session_state.user = user
+    st.session_state.access_token = session.access_token
+    st.session_state.refresh_token = session.refresh_token
+    st.session_state.token_created_at = datetime.now(timezone.utc)
+    st.session_state.expires_in = session.expires_in
+    current_auth_context().set_user(user)
 
 def load_session_from_url():
     """Load and restore session from URL parameters"""
@@ -56,44 +66,22 @@ def load_session_from_url():
         if not session_data:
             clear_session_from_url()
             return False
-            
-        # Check if session data is expired (with 5 minute buffer)
-        token_created_at = datetime.fromisoformat(session_data['token_created_at'])
-        buffer_time = 300  # 5 minutes
-        expiration_time = token_created_at + timedelta(seconds=session_data['expires_in'] - buffer_time)
-        
-        if datetime.now(timezone.utc) > expiration_time:
-            # Try to refresh the token
-            try:
-                result = supabase.auth.refresh_session(session_data['refresh_token'])
-                if result.session and result.user:
-                    # Update URL with new session data
-                    save_session_to_url(result.user, result.session)
-                    return True
-                else:
-                    clear_session_from_url()
-                    return False
-            except Exception:
-                clear_session_from_url()
-                return False
+
+        # The token cache checks the access token's own expiry and only calls
+        # refresh_session when it is missing or about to run out
+        user, session = take_prefetched(
+            "auth", get_token_cache().resolve, session_data['refresh_token'], current_auth_context()
+        )
+        if not (user and session):
+            clear_session_from_url()
+            return False
+
+        if session.refresh_token != session_data['refresh_token']:
+            # Token was rotated; keep the URL pointing at the live one
+            save_session_to_url(user, session)
         else:
-            # Session is still valid, restore to session state
-            try:
-                # Try to refresh to get current access token
-                result = supabase.auth.refresh_session(session_data['refresh_token'])
-                if result.session and result.user:
-                    st.session_state.user = result.user
-                    st.session_state.refresh_token = result.session.refresh_token
-                    st.session_state.access_token = result.session.access_token
-                    st.session_state.token_created_at = datetime.now(timezone.utc)
-                    st.session_state.expires_in = result.session.expires_in
-                    return True
-                else:
-                    clear_session_from_url()
-                    return False
-            except Exception:
-                clear_session_from_url()
-                return False
+            store_session_state(user, session)
+        return True
                 
     except Exception as e:
         clear_session_from_url()
@@ -101,6 +89,9 @@ def load_session_from_url():
 
 def clear_session_from_url():
     """Clear session data from URL and session state"""
+    if st.session_state.get("refresh_token"):
+        get_token_cache().forget(st.session_state.refresh_token)
+
     # Clear URL parameter
     if "session" in st.query_params:
         del st.query_params["session"]
@@ -115,22 +106,42 @@ def clear_session_from_url():
     for key in keys_to_clear:
         if key in st.session_state:
             del st.session_state[key]
+    current_auth_context().set_user(None)
+
+def refresh_session_state():
+    """Keep this browser session's access token live for its data requests.
+
+    A dictionary lookup while the token is good; the auth API is only called near expiry.
+    """
+    refresh_token = st.session_state.get("refresh_token")
+    if not refresh_token:
+        return
+    try:
+        user, session = get_token_cache().resolve(refresh_token, current_auth_context())
+    except Exception:
+        # The access token we have may still be good; the next run tries again
+        return
+    if not (user and session):
+        return
+    if session.refresh_token != refresh_token:
+        save_session_to_url(user, session)
+    else:
+        store_session_state(user, session)
 
 def is_authenticated():
     """Check if user is authenticated via session state or URL"""
-    # First check session state
-    if "user" in st.session_state and st.session_state.user:
-        return True
-    
-    # If not in session state, try to load from URL
-    return load_session_from_url()
+    return get_current_user() is not None
 
 def get_current_user():
-    """Get current user, loading from URL if necessary"""
+    """Get current user, resolved at most once per script run"""
+    context = current_auth_context()
+    if context.resolved:
+        return context.user
+
     if "user" in st.session_state and st.session_state.user:
-        return st.session_state.user
-    
-    if load_session_from_url():
-        return st.session_state.get("user")
-    
-    return None
\ No newline at end of file
+        refresh_session_state()
+        context.set_user(st.session_state.user)
+    elif not load_session_from_url():
+        # A failed load may have cleared things already; record the outcome either way
+        context.set_user(None)
+    return context.user
\ No newline at end of file
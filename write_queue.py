@@ -0,0 +1,241 @@
+# write_queue.py
+import logging
+import threading
+import time
+import streamlit as st
+from storage import get_storage, get_service_storage
+from session_cache import get_session_cache
+from timer_state import get_timer_states
+from outbox import Outbox, DEFAULT_OUTBOX_PATH, new_client_key
+
+logger = logging.getLogger(__name__)
+
+# Wait this long after the first queued write so bursts go out together
+FLUSH_INTERVAL_SECONDS = 0.2
+
+# Max outbox entries sent per flush
+MAX_ENTRIES_PER_FLUSH = 100
+
+# First retry delay after a failed sync; doubles on each further failure
+RETRY_BACKOFF_SECONDS = 0.5
+
+# Writes are durable, so keep retrying while the backend is down, up to this far apart
+MAX_OUTBOX_BACKOFF_SECONDS = 60
+
+# A write the backend rejects (rather than fails to reach) is set aside after this many attempts
+DEAD_LETTER_AFTER_ATTEMPTS = 5
+
+
+class WriteQueue:
+    """Write-behind queue: every timer transition goes through a durable outbox and lands in one call"""
+
+    def __init__(self, session_cache, outbox, storage, timer_states, start=True):
+        self._session_cache = session_cache
+        self._outbox = outbox
+        self._storage = storage
+        self._timer_states = timer_states
+        self._cond = threading.Condition()
+        # user_id -> (outbox seq, active_timer op) for the latest transition not yet confirmed
+        self._timer_ops = {}
+        self._failures = {}
+        # user_id -> (current backoff, time of next attempt); each user's writes retry on their own
+        self._backoff = {}
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        if start:
+            # Tests leave the worker off and flush by hand
+            self._thread.start()
+
+    # ---------------------- Producers ----------------------
+    def transition(self, user_id, action, timer_op=None, timer=None, insert_session=None, update_session=None,
+                   expected_version=None):
+        """Record one timer transition: an active_timer write ('upsert', 'update' or 'delete') plus
+        the sessions insert and/or update that go with it, applied together by the backend.
+
+        Returns without waiting for the backend. With expected_version the transition is refused,
+        here if this process already knows the timer moved on and again in the database, unless
+        the timer is still at that version. The database bumps the version by exactly one per timer
+        write, so a transition that passes lands as expected_version + 1; that is returned as
+        "version" right away. Returns {"ok", "action", "version", "state_version"}, where
+        state_version is the in-process timer state version after the write.
+        """
+        version = expected_version + 1 if timer_op and expected_version is not None else expected_version
+        transition = {
+            "action": action,
+            "timer_op": timer_op,
+            "timer": dict(timer) if timer else None,
+            "insert_session": insert_session,
+            "update_session": update_session,
+            "expected_version": expected_version,
+            # Makes a resend idempotent: the backend answers a known key with its first result
+            "key": new_client_key(),
+        }
+        if timer_op == "delete" and expected_version is None:
+            # It could remove a timer started elsewhere meanwhile; the caller rereads the timer instead
+            return {"ok": False, "action": action, "version": None, "state_version": None}
+        state_version = 0
+        local = dict(timer or {}, **({"version": version} if version is not None else {}))
+        if timer_op:
+            state_version = self._timer_states.apply(user_id, timer_op, local, expected_version)
+            if state_version is None:
+                # Another tab in this process already moved the timer on
+                return {"ok": False, "action": action, "version": None, "state_version": None}
+        seq = self._outbox.append(user_id, "transition", transition["key"], transition)
+        if timer_op:
+            with self._cond:
+                current = self._timer_ops.get(user_id)
+                op = {"kind": timer_op, "data": local}
+                if timer_op == "update" and current:
+                    # Merge into the pending write; an update after a delete changes nothing
+                    kind, data = current[1]["kind"], current[1]["data"]
+                    op = {"kind": kind, "data": data if kind == "delete" else {**data, **local}}
+                self._timer_ops[user_id] = (seq, op)
+        self._wake()
+        return {"ok": True, "action": action, "version": version, "state_version": state_version}
+
+    def apply_transition(self, user_id, transition, storage=None):
+        """Apply a transition right away and return the backend's result; for the scheduler, which
+        runs off the script thread and has no tab to follow up a refusal.
+
+        storage overrides the backend, e.g. with one allowed to write any user's timer.
+        """
+        result = (storage or self._storage).transition(user_id, {"key": new_client_key(), **transition})
+        if not result["ok"]:
+            # Someone else moved the timer on; the next read reconciles with the database
+            self._timer_states.forget(user_id)
+            return result
+        if transition.get("timer_op"):
+            self._timer_states.apply(user_id, "upsert" if result["timer"] else "delete", result["timer"])
+        self._session_cache.invalidate(user_id, result["session_ids"])
+        return result
+
+    def pending_active_timer(self, user_id):
+        """The not-yet-confirmed active_timer op for a user, so reads see our own writes"""
+        with self._cond:
+            pending = self._timer_ops.get(user_id)
+            return {"kind": pending[1]["kind"], "data": dict(pending[1]["data"])} if pending else None
+
+    def unsynced_sessions(self, user_id):
+        """Writes recorded locally but not yet confirmed by the backend"""
+        return self._outbox.pending_count(user_id)
+
+    def drain_failures(self, user_id):
+        """Messages for writes the backend refused or that were set aside after repeated rejections"""
+        with self._cond:
+            return self._failures.pop(user_id, [])
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    # ---------------------- Worker ----------------------
+    def _run(self):
+        while True:
+            self._wait_for_work()
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+            try:
+                self._flush_outbox()
+            except Exception:
+                logger.exception("Write queue flush failed")
+
+    def _wait_for_work(self):
+        with self._cond:
+            while True:
+                users = self._outbox.pending_users()
+                if not users:
+                    self._cond.wait()
+                    continue
+                now = time.time()
+                next_attempt = min(self._backoff.get(user_id, (0, 0))[1] for user_id in users)
+                if next_attempt <= now:
+                    return
+                self._cond.wait(timeout=next_attempt - now)
+
+    def _flush_outbox(self):
+        now = time.time()
+        # Order only matters within a user: one user's failing write never holds up anyone else's
+        blocked = {user_id for user_id, (_, at) in self._backoff.items() if at > now}
+        for entry in self._outbox.pending(MAX_ENTRIES_PER_FLUSH, skip_users=blocked):
+            user_id = entry["user_id"]
+            if user_id in blocked:
+                continue
+            try:
+                result = self._storage.transition(user_id, entry["payload"])
+            except Exception as e:
+                # Keep this user's order: nothing after the failed entry is sent in this flush
+                self._handle_failure(entry, e)
+                blocked.add(user_id)
+                continue
+            self._backoff.pop(user_id, None)
+            self._outbox.acknowledge([entry["seq"]])
+            self._settle_timer_ops([entry["seq"]])
+            if result["ok"]:
+                self._session_cache.invalidate(user_id, result["session_ids"])
+            else:
+                # Nothing was written
+                logger.warning("Timer transition %r for user %s was refused", result["action"], user_id)
+                self._report(user_id, f"apply timer {result['action']}: the timer was changed elsewhere")
+                self._abandon_timer(user_id)
+                blocked.add(user_id)
+
+    def _handle_failure(self, entry, error):
+        """Back off this user's writes, or set a repeatedly rejected one aside so the rest can move on"""
+        user_id = entry["user_id"]
+        attempts = self._outbox.record_failure(entry["seq"], error)
+        if not self._storage.is_transient(error) and attempts >= DEAD_LETTER_AFTER_ATTEMPTS:
+            logger.error("Setting aside timer %s for user %s after %d attempts: %s",
+                         entry["payload"]["action"], user_id, attempts, error)
+            self._outbox.dead_letter(entry["seq"])
+            self._settle_timer_ops([entry["seq"]])
+            self._backoff.pop(user_id, None)
+            self._report(user_id, f"save timer {entry['payload']['action']}: {error}")
+            # What this process shows for the timer never reached the database
+            self._abandon_timer(user_id)
+            return
+        logger.warning("Sync of timer %s for user %s failed, will retry: %s", entry["payload"]["action"], user_id, error)
+        backoff = self._backoff.get(user_id, (0, 0))[0]
+        backoff = min(MAX_OUTBOX_BACKOFF_SECONDS, max(RETRY_BACKOFF_SECONDS, backoff * 2))
+        self._backoff[user_id] = (backoff, time.time() + backoff)
+
+    def _report(self, user_id, message):
+        with self._cond:
+            self._failures.setdefault(user_id, []).append(message)
+
+    def _abandon_timer(self, user_id):
+        """A transition for the user never landed: drop this process's view of the timer so every tab
+        rereads the database, and the user's queued transitions that were built on it"""
+        with self._cond:
+            self._timer_ops.pop(user_id, None)
+        self._timer_states.forget(user_id)
+        for entry in self._outbox.pending(user_id=user_id):
+            # Their expected versions assumed the lost write landed; one could even match by chance
+            if entry["payload"].get("expected_version") is not None:
+                self._outbox.dead_letter(entry["seq"])
+                self._report(user_id, f"apply timer {entry['payload']['action']}: the timer was changed elsewhere")
+
+    def _settle_timer_ops(self, seqs):
+        seqs = set(seqs)
+        with self._cond:
+            for user_id, (seq, _) in list(self._timer_ops.items()):
+                # Leave it if a newer transition for this user is still queued
+                if seq in seqs:
+                    del self._timer_ops[user_id]
+
+
+def outbox_path():
+    """Where the write outbox lives; override with [outbox] path in secrets"""
+    try:
+        return st.secrets.get("outbox", {}).get("path", DEFAULT_OUTBOX_PATH)
+    except Exception:
+        return DEFAULT_OUTBOX_PATH
+
+
+@st.cache_resource
+def get_write_queue():
+    """Process-wide write-behind queue shared by every script session.
+
+    The worker replays every user's writes, so it prefers the service-role backend: entries carry
+    the verified user_id they were recorded for, and they still go out after a restart. Without a
+    service-role key each entry is sent with its user's own token, waiting while there is none.
+    """
+    storage = get_service_storage() or get_storage()
+    return WriteQueue(get_session_cache(), Outbox(outbox_path()), storage, get_timer_states())